@@ -5,3 +5,5 @@
 # __version__ = "0.1.0"
 
 # from cli import main
+
+from Cerbex.spans import span, current_span
@@ -0,0 +1,171 @@
+# File: aio.py
+"""
+Asyncio helpers for timing coroutines correctly.
+
+- step_timed() drives a wrapped coroutine one step at a time and reports each
+  suspension (the coroutine yielded to the loop) and resumption.
+- task_clock() returns per-task suspended-time bookkeeping, so timings are
+  split into active and suspended time even with many interleaved tasks.
+- LoopLagProbe measures event-loop lag and names the wrapped coroutine that
+  was running while the loop was blocked.
+"""
+import asyncio
+import sys
+import threading
+import types
+from asyncio import current_task
+from asyncio.events import _get_running_loop
+from time import perf_counter_ns
+from typing import Callable, Dict, List, Optional, Set
+from weakref import WeakKeyDictionary
+
+
+@types.coroutine
+def step_timed(coro, module: str, func: str,
+               on_suspend: Callable[[str, str], None],
+               on_resume: Callable[[str, str], None]):
+    """
+    Await `coro`, calling on_suspend/on_resume around every yield to the loop.
+    """
+    it = coro.__await__()
+    value, exc = None, None
+    while True:
+        try:
+            yielded = it.send(value) if exc is None else it.throw(exc)
+        except StopIteration as stop:
+            return stop.value
+        on_suspend(module, func)
+        try:
+            value, exc = (yield yielded), None
+        except GeneratorExit:
+            it.close()
+            raise
+        except BaseException as e:
+            value, exc = None, e
+        on_resume(module, func)
+
+
+class TaskClock:
+    """
+    Cumulative suspended time of one asyncio task, as wall time and as thread
+    CPU time spent elsewhere on the loop thread meanwhile.
+    """
+    __slots__ = ("task", "suspended_ns", "suspended_at", "suspended_cpu_ns", "cpu_at")
+
+    def __init__(self, task) -> None:
+        self.task = task
+        self.suspended_ns = 0
+        self.suspended_at = 0
+        self.suspended_cpu_ns = 0
+        self.cpu_at = 0
+
+    def suspend(self, now: int, cpu: int = 0) -> None:
+        # Nested wrapped coroutines all report the same suspension; count it once
+        if not self.suspended_at:
+            self.suspended_at = now
+            self.cpu_at = cpu
+
+    def resume(self, now: int, cpu: int = 0) -> None:
+        if self.suspended_at:
+            self.suspended_ns += now - self.suspended_at
+            self.suspended_cpu_ns += cpu - self.cpu_at
+            self.suspended_at = 0
+
+
+def task_clock(var) -> Optional[TaskClock]:
+    """
+    The TaskClock of the running task, kept in the ContextVar `var`.
+    Child tasks inherit their parent's context, so ownership is checked.
+    Returns None outside a running task.
+    """
+    if _get_running_loop() is None:
+        return None
+    task = current_task()
+    if task is None:
+        return None
+    clock = var.get(None)
+    if clock is None or clock.task is not task:
+        clock = TaskClock(task)
+        var.set(clock)
+    return clock
+
+
+class LoopLagProbe:
+    """
+    Event-loop lag probe. A heartbeat scheduled on each loop measures how late it
+    fires; a watchdog thread samples the loop thread's stack while a heartbeat is
+    overdue and attributes the lag to the innermost wrapped function found there (usually the
+    coroutine, or a blocking call it made).
+    """
+    def __init__(self, threshold: float, wrapper_codes: Set[types.CodeType], interval: float = None) -> None:
+        self.threshold_ns = int(threshold * 1e9)
+        self.interval = interval if interval is not None else threshold / 2
+        self.wrapper_codes = wrapper_codes
+        self._loops: "WeakKeyDictionary[asyncio.AbstractEventLoop, _LoopState]" = WeakKeyDictionary()
+        self._lock = threading.Lock()
+        # culprit -> [episodes, total lag ns, max lag ns]
+        self.lags: Dict[str, List[int]] = {}
+        self._stop = threading.Event()
+        self._watchdog: Optional[threading.Thread] = None
+
+    def watch(self, loop) -> None:
+        """Start probing `loop` (idempotent, must run on the loop's thread)."""
+        if loop in self._loops:
+            return
+        with self._lock:
+            if loop in self._loops:
+                return
+            state = self._loops[loop] = _LoopState(threading.get_ident())
+            if self._watchdog is None:
+                self._watchdog = threading.Thread(target=self._watch, name="cerbex-looplag", daemon=True)
+                self._watchdog.start()
+        self._schedule(loop, state)
+
+    def _schedule(self, loop, state: "_LoopState") -> None:
+        state.expected = perf_counter_ns() + int(self.interval * 1e9)
+        try:
+            loop.call_later(self.interval, self._tick, loop, state)
+        except RuntimeError:
+            pass  # loop closed
+
+    def _tick(self, loop, state: "_LoopState") -> None:
+        lag = perf_counter_ns() - state.expected
+        if lag >= self.threshold_ns:
+            culprit = state.culprit or "<not a wrapped coroutine>"
+            entry = self.lags.setdefault(culprit, [0, 0, 0])
+            entry[0] += 1
+            entry[1] += lag
+            entry[2] = max(entry[2], lag)
+        state.culprit = None
+        if not loop.is_closed() and not self._stop.is_set():
+            self._schedule(loop, state)
+
+    def _watch(self) -> None:
+        while not self._stop.wait(self.interval):
+            now = perf_counter_ns()
+            for loop, state in list(self._loops.items()):
+                if state.culprit is None and now - state.expected >= self.threshold_ns:
+                    state.culprit = self._running_coroutine(state.thread)
+
+    def _running_coroutine(self, thread: int) -> Optional[str]:
+        frame = sys._current_frames().get(thread)
+        while frame is not None:
+            if frame.f_code in self.wrapper_codes:
+                names = frame.f_locals
+                fn = names.get("fn")
+                if fn is not None:
+                    return f"{names.get('module')}.{fn.__name__}"
+            frame = frame.f_back
+        return None
+
+    def stop(self) -> None:
+        self._stop.set()
+
+
+class _LoopState:
+    __slots__ = ("thread", "expected", "culprit", "__weakref__")
+
+    def __init__(self, thread: int) -> None:
+        self.thread = thread
+        self.expected = 0
+        self.culprit: Optional[str] = None
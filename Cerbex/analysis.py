@@ -1,70 +1,547 @@
 # File: analysis.py
+import os
+import gc
+import sys
+import dis
+import json
+import linecache
 import threading
+import tracemalloc
 import atexit
-from typing import Any, List, Tuple
+from typing import Any, Callable, Dict, List, Optional, Tuple
 from Cerbex.hook_manager import Analysis
-from time import perf_counter
+from Cerbex.histogram import LogHistogram
+from Cerbex.samples import FunctionIds, SampleBuffer, write_samples
+from Cerbex.logs import write_columnar
+from Cerbex.calltree import CallNode, ThreadCallTree
+from Cerbex.timeline import BEGIN, END, EventRing, chrome_trace
+from Cerbex import spans
+from Cerbex.spans import Span
+from Cerbex.aio import LoopLagProbe, task_clock
+from Cerbex import locks
+from Cerbex import iotrack
+from Cerbex.utils import wrapped_function, wrapper_codes
+from Cerbex.importer import matches_target
+from Cerbex.lineprof import LineTimes, line_backend
+from Cerbex.complexity import MODELS as GROWTH_MODELS, SIZE_EXTRACTORS, call_size, fit_growth, load_extractor
+from Cerbex.exemplars import Exemplar, SlowestCalls
+from Cerbex.windows import Window, WindowRing
+from Cerbex.metrics import MetricsServer, prometheus_text
+from contextvars import ContextVar
+from datetime import datetime
+from asyncio.events import _get_running_loop
+from time import perf_counter, perf_counter_ns, thread_time_ns
 
 
 class PerfAnalyzer(Analysis):
     """
     Measures execution time of each function call with zero I/O overhead during execution.
     Buffers timings in memory and dumps to file at program exit.
+
+    Modes:
+      - "log": keep every (module.func, duration) and write one line per call.
+      - "aggregate": keep a fixed-size latency histogram per function and thread,
+        so memory is O(functions) rather than O(calls).
+      - "samples": keep every call as integer-nanosecond start/end plus a function
+        ID in preallocated arrays, written as a binary block file at exit.
+      - "columnar": recorded like "samples", written at exit as a columnar
+        binary log (.cbx) for Cerbex.logs.load().
+
+    With calltree=True, a per-thread call tree with inclusive/exclusive time is
+    also kept and written as collapsed stacks (.folded) and JSON (.tree.json).
+
+    The timing stack and the call-tree cursor are task-local (ContextVars), so
+    interleaved asyncio tasks on one thread do not corrupt each other's timings
+    or attach children to each other's calls. Wrapped coroutines that
+    suspend get their wall time split into active and suspended time. With
+    loop_lag > 0 (seconds), event-loop stalls at least that long are reported
+    together with the wrapped function that was running during the stall.
+
+    With cpu=True, per-thread CPU time (thread_time_ns) is also sampled at call
+    and return and reported next to wall time, with their ratio per function.
+    CPU used by other tasks while a coroutine is suspended is not counted.
+
+    With exemplars=K > 0, the K slowest calls of each wrapped Python function
+    are kept with their timestamp, thread, caller and a truncated argument repr.
+    Arguments are only referenced until return and rendered only for calls
+    that make the top K.
+
+    With window > 0 (seconds), every call is also counted in a ring of
+    `windows` fixed-length wall-clock windows (count, total and a coarse
+    histogram per function), queryable with series() while the process runs
+    and written to a .series.jsonl file at exit.
+
+    With metrics_port set, per-function histograms are kept in every mode and
+    served live in Prometheus format at http://metrics_host:metrics_port/metrics.
+
+    In log mode, when the HookManager has a LogFlusher, per-call lines are
+    streamed to a rotating perf.log in the background instead of buffered.
     """
-    def __init__(self, outfile: str = "perf.log") -> None:
+    MODES = ("log", "aggregate", "samples", "columnar")
+
+    def __init__(self, outfile: str = "perf.log", mode: str = "log", calltree: bool = False,
+                 loop_lag: float = 0.0, cpu: bool = False, exemplars: int = 0,
+                 window: float = 0.0, windows: int = 3600,
+                 metrics_port: Optional[int] = None, metrics_host: str = "127.0.0.1") -> None:
+        if mode not in self.MODES:
+            raise ValueError(f"Unknown PerfAnalyzer mode {mode!r}, expected one of {self.MODES}")
         self.outfile = outfile
+        self.mode = mode
         self._local = threading.local()
         self.exclude_prefixes = {
                 'builtins', '__builtins__', 'fastapi', 'pydantic', 
                 'starlette', '_json'
             }
+        self._aggregate = mode == "aggregate"
+        self._samples = mode in ("samples", "columnar")
+        self._clock = perf_counter if mode == "log" else perf_counter_ns
+        # Task-local stack of (start, cpu start, TaskClock or None, suspended ns at start,
+        # suspended cpu ns at start, (args, kwargs) if keeping exemplars, parent)
+        self._stack: ContextVar[Optional[tuple]] = ContextVar(f"cerbex_perf_{id(self)}", default=None)
+        self._task_clock = ContextVar(f"cerbex_perf_clock_{id(self)}", default=None)
+        # module.func -> [calls that suspended, wall ns, suspended ns]
+        self._suspended: Dict[str, List[int]] = {}
+        self._lag = LoopLagProbe(loop_lag, wrapper_codes()) if loop_lag > 0 else None
+        # CPU time: one {module.func: [calls, wall ns, cpu ns]} per thread, merged at dump
+        self._cpu = cpu
+        self._thread_cpu: List[Dict[str, List[int]]] = []
+        self._exemplars = SlowestCalls(exemplars, wrapper_codes()) if exemplars > 0 else None
+        self._windows = WindowRing(window, windows) if window > 0 else None
+        self.series_file = os.path.splitext(outfile)[0] + ".series.jsonl"
+        self._metrics = None
+        if metrics_port is not None:
+            self._metrics = MetricsServer(self.metrics_text, metrics_host, metrics_port).start()
+        # Ask HookManager to time analysis callbacks for the overhead gauge
+        self.needs_overhead = self._metrics is not None
+        # C calls reported by the profile hook carry no arguments
+        self._c_ext_modules: set = set()
         
         # Buffer for (module.func, duration) tuples
         self._buffer: List[Tuple[str, float]] = []
+        # Where log-mode records go: the buffer, or a LogStream once on_install finds a flusher
+        self._emit = self._buffer.append
+        self._stream = None
+        # Aggregate mode: one {module: {func: LogHistogram}} per thread, merged at dump
+        self._thread_stats: List[Dict[str, Dict[str, LogHistogram]]] = []
+        self._stats_lock = threading.Lock()
+        # Samples mode: interned function IDs and one SampleBuffer per thread
+        self._fids = FunctionIds()
+        self._sample_buffers: List[SampleBuffer] = []
+        self.samples_file = os.path.splitext(outfile)[0] + (".cbx" if mode == "columnar" else ".bin")
+        # Optional call trees, one per thread
+        self._calltree = calltree
+        self._trees: List[ThreadCallTree] = []
+        # Task-local top frame of the call tree (see ThreadCallTree)
+        self._tree_frame: ContextVar[Optional[list]] = ContextVar(f"cerbex_perf_tree_{id(self)}", default=None)
+        self.folded_file = os.path.splitext(outfile)[0] + ".folded"
+        self.tree_file = os.path.splitext(outfile)[0] + ".tree.json"
+        # Functions unwrapped as hot and cheap: module.func -> stats at unwrap time
+        self._unwrapped: Dict[str, Dict[str, float]] = {}
+        # OverheadGovernor of the HookManager, if calls are being sampled
+        self._governor = None
+        # HookManager.overhead, for the metrics endpoint
+        self._overhead: Optional[Callable[[], float]] = None
+        self._gc: Optional["GCAnalyzer"] = None
         # Register dump at program exit
         atexit.register(self._dump)
 
+    def on_install(self, hook_mgr):
+        self._governor = hook_mgr.governor
+        self._overhead = hook_mgr.overhead
+        self._c_ext_modules = hook_mgr.c_ext_modules
+        if hook_mgr.flusher is not None and self.mode == "log":
+            self._stream = hook_mgr.flusher.stream(self.outfile, self._format_record)
+            self._emit = self._stream.write
+        # Report GC pause time next to perf stats when a GCAnalyzer runs too
+        self._gc = next((a for a in hook_mgr.analyses if isinstance(a, GCAnalyzer)), None)
+
 
     def on_call(self, module, func, args, kwargs):
         if module.startswith(tuple(self.exclude_prefixes)):
             return
-        stack = getattr(self._local, "stack", None)
-        if stack is None:
-            stack = []
-            self._local.stack = stack
-        stack.append(perf_counter())
+        clock = task_clock(self._task_clock)
+        self._stack.set((
+            self._clock(),
+            thread_time_ns() if self._cpu else 0,
+            clock,
+            clock.suspended_ns if clock else 0,
+            clock.suspended_cpu_ns if clock else 0,
+            (args, kwargs) if self._exemplars is not None and module not in self._c_ext_modules else None,
+            self._stack.get(),
+        ))
+        if self._calltree:
+            self._tree_frame.set(self._thread_tree().enter((module, func), perf_counter_ns(), self._tree_frame.get()))
 
     def on_return(self, module, func, result):
         if module.startswith(tuple(self.exclude_prefixes)):
             return
-        stack = getattr(self._local, "stack", None)
-        if not stack:
+        frame = self._stack.get()
+        if frame is None:
+            return
+        start, cpu_start, clock, suspended_at_start, suspended_cpu_at_start, call_args, parent = frame
+        self._stack.set(parent)
+        if call_args is not None:
+            self._exemplars.offer(f"{module}.{func}", self._wall_ns(start), *call_args)
+        if self._windows is not None:
+            self._windows.record(f"{module}.{func}", self._wall_ns(start))
+        if self._cpu:
+            cpu_ns = thread_time_ns() - cpu_start
+            if clock is not None:
+                cpu_ns -= clock.suspended_cpu_ns - suspended_cpu_at_start
+            self._record_cpu(module, func, self._wall_ns(start), cpu_ns)
+        if clock is not None and clock.suspended_ns != suspended_at_start:
+            self._record_suspended(module, func, start, clock.suspended_ns - suspended_at_start)
+        if self._calltree:
+            self._exit_tree()
+        if self._aggregate:
+            self._record(module, func, perf_counter_ns() - start)
+            return
+        if self._metrics is not None:
+            self._record(module, func, self._wall_ns(start))
+        if self._samples:
+            end = perf_counter_ns()
+            buf = getattr(self._local, "samples", None)
+            if buf is None:
+                buf = self._local.samples = SampleBuffer(threading.get_ident())
+                with self._stats_lock:
+                    self._sample_buffers.append(buf)
+            buf.add(start, end, self._fids.get(module, func))
             return
-        start = stack.pop()
         duration = perf_counter() - start
-        self._buffer.append((f"{module}.{func}", duration))
+        self._emit((f"{module}.{func}", duration))
+
+    @staticmethod
+    def _format_record(record: Tuple[str, float]) -> str:
+        return f"[Perf] {record[0]} took {record[1]:.6f}s\n"
+
+    def _record(self, module: str, func: str, duration_ns: int) -> None:
+        stats = getattr(self._local, "stats", None)
+        if stats is None:
+            stats = self._local.stats = {}
+            with self._stats_lock:
+                self._thread_stats.append(stats)
+        funcs = stats.get(module)
+        if funcs is None:
+            funcs = stats[module] = {}
+        hist = funcs.get(func)
+        if hist is None:
+            hist = funcs[func] = LogHistogram()
+        hist.record(duration_ns)
+
+    def _wall_ns(self, start) -> int:
+        if self._clock is perf_counter_ns:
+            return perf_counter_ns() - start
+        return int((perf_counter() - start) * 1e9)
+
+    def _record_cpu(self, module: str, func: str, wall_ns: int, cpu_ns: int) -> None:
+        per_thread = getattr(self._local, "cpu", None)
+        if per_thread is None:
+            per_thread = self._local.cpu = {}
+            with self._stats_lock:
+                self._thread_cpu.append(per_thread)
+        name = f"{module}.{func}"
+        entry = per_thread.get(name)
+        if entry is None:
+            entry = per_thread[name] = [0, 0, 0]
+        entry[0] += 1
+        entry[1] += wall_ns
+        entry[2] += cpu_ns
+
+    def cpu_times(self) -> Dict[str, Tuple[int, float, float, float]]:
+        """
+        Returns module.func -> (calls, wall seconds, cpu seconds, cpu/wall) (cpu=True).
+        """
+        with self._stats_lock:
+            per_thread = list(self._thread_cpu)
+        merged: Dict[str, List[int]] = {}
+        for stats in per_thread:
+            for name, (calls, wall, cpu) in list(stats.items()):
+                entry = merged.setdefault(name, [0, 0, 0])
+                entry[0] += calls
+                entry[1] += wall
+                entry[2] += cpu
+        return {name: (calls, wall / 1e9, cpu / 1e9, cpu / wall if wall else 0.0)
+                for name, (calls, wall, cpu) in merged.items()}
+
+    def _record_suspended(self, module: str, func: str, start, suspended_ns: int) -> None:
+        wall_ns = self._wall_ns(start)
+        name = f"{module}.{func}"
+        with self._stats_lock:
+            entry = self._suspended.get(name)
+            if entry is None:
+                entry = self._suspended[name] = [0, 0, 0]
+            entry[0] += 1
+            entry[1] += wall_ns
+            entry[2] += suspended_ns
+
+    def on_suspend(self, module, func):
+        clock = task_clock(self._task_clock)
+        if clock is not None:
+            clock.suspend(perf_counter_ns(), thread_time_ns() if self._cpu else 0)
+        if self._lag is not None:
+            self._lag.watch(_get_running_loop())
+
+    def on_resume(self, module, func):
+        clock = task_clock(self._task_clock)
+        if clock is not None:
+            clock.resume(perf_counter_ns(), thread_time_ns() if self._cpu else 0)
+
+    def async_split(self) -> Dict[str, Tuple[int, float, float]]:
+        """
+        Returns module.func -> (calls that suspended, active seconds, suspended seconds).
+        """
+        with self._stats_lock:
+            items = [(name, list(v)) for name, v in self._suspended.items()]
+        return {name: (calls, (wall - susp) / 1e9, susp / 1e9) for name, (calls, wall, susp) in items}
+
+    def loop_lags(self) -> Dict[str, Tuple[int, float, float]]:
+        """
+        Returns culprit -> (stalls, total lag seconds, max lag seconds) (loop_lag > 0).
+        """
+        if self._lag is None:
+            return {}
+        return {name: (n, total / 1e9, worst / 1e9) for name, (n, total, worst) in list(self._lag.lags.items())}
+
+    def slowest_calls(self) -> Dict[str, List[Exemplar]]:
+        """
+        Returns module.func -> its slowest calls, slowest first (exemplars > 0).
+        """
+        if self._exemplars is None:
+            return {}
+        return self._exemplars.slowest()
+
+    def series(self, name: Optional[str] = None, since: Optional[float] = None) -> Dict[str, List[Window]]:
+        """
+        Returns module.func -> its time windows, oldest first (window > 0).
+        `since` is epoch seconds.
+        """
+        if self._windows is None:
+            return {}
+        return self._windows.series(name, since)
+
+    def export_series(self, path: Optional[str] = None) -> int:
+        """
+        Writes the current windows as JSON lines (default: the .series.jsonl file).
+        """
+        if self._windows is None:
+            return 0
+        return self._windows.export(path or self.series_file)
+
+    def on_raise(self, module, func, exc):
+        # The call is not recorded, but it must leave the task's stacks
+        if module.startswith(tuple(self.exclude_prefixes)):
+            return
+        frame = self._stack.get()
+        if frame is not None:
+            self._stack.set(frame[-1])
+        if self._calltree:
+            self._exit_tree()
+
+    def _exit_tree(self) -> None:
+        frame = self._tree_frame.get()
+        if frame is not None:
+            self._tree_frame.set(ThreadCallTree.exit(frame, perf_counter_ns()))
+
+    def _thread_tree(self) -> ThreadCallTree:
+        tree = getattr(self._local, "tree", None)
+        if tree is None:
+            tree = self._local.tree = ThreadCallTree()
+            with self._stats_lock:
+                self._trees.append(tree)
+        return tree
+
+    def call_tree(self) -> CallNode:
+        """
+        Returns the root of the call tree merged across threads (calltree=True).
+        """
+        with self._stats_lock:
+            trees = list(self._trees)
+        root = CallNode(None)
+        for tree in trees:
+            root.merge(tree.root)
+        return root
+
+    def on_unwrap(self, module, func, stats):
+        self._unwrapped[f"{module}.{func}"] = stats
 
     def results(self) -> List[Tuple[str, float]]:
         """
         Returns the list of ("module.func", duration) tuples.
         """
+        if self._samples:
+            names = self._fids.names
+            return [(names[ids[i]], (ends[i] - starts[i]) / 1e9)
+                    for buf in list(self._sample_buffers)
+                    for starts, ends, ids, n in buf.blocks()
+                    for i in range(n)]
         return list(self._buffer)
 
+    def aggregates(self) -> Dict[str, LogHistogram]:
+        """
+        Returns "module.func" -> nanosecond histogram merged across threads (aggregate mode).
+        """
+        with self._stats_lock:
+            per_thread = list(self._thread_stats)
+        merged: Dict[str, LogHistogram] = {}
+        for stats in per_thread:
+            for module, funcs in list(stats.items()):
+                for func, hist in list(funcs.items()):
+                    name = f"{module}.{func}"
+                    if name in merged:
+                        merged[name].merge(hist)
+                    else:
+                        merged[name] = hist.copy()
+        return merged
+
+    def metrics_text(self) -> str:
+        """
+        Returns the current histograms and Cerbex's overhead in Prometheus text format.
+        """
+        overhead = self._overhead() if self._overhead is not None else None
+        return prometheus_text(self.aggregates(), self._governor, overhead)
+
+    def unwrapped_estimates(self) -> Dict[str, Tuple[int, float, float, float, float, float]]:
+        """
+        Returns module.func -> (estimated calls, estimated seconds, estimated
+        unwrapped calls/s, calls/s measured while wrapped, window seconds,
+        seconds since unwrap) for functions unwrapped as hot. Unwrapped calls
+        are not observed. The unwrapped rate counts only the function's own
+        time and the caller's work between calls, both still measured with
+        part of the wrapper's bookkeeping in them, so it is a lower bound for
+        the workload at unwrap time. The call figure assumes that rate held
+        for the rest of the run; the seconds multiply it by the mean duration
+        measured while wrapped.
+        """
+        now = perf_counter_ns()
+        out = {}
+        for name, st in self._unwrapped.items():
+            since = (now - st['unwrapped_at']) / 1e9
+            rate = st.get('unwrapped_rate', st['rate'])
+            calls = int(rate * since)
+            out[name] = (calls, calls * st['mean_ns'] / 1e9, rate, st['rate'],
+                         st.get('window_ns', 0) / 1e9, since)
+        return out
+
     def _dump(self) -> None:
         """
         Writes all buffered timings to the output file in one batch.
         """
-        if not self._buffer:
+        aggregates = self.aggregates() if self._aggregate else {}
+        if self._calltree:
+            self._dump_call_tree()
+        if self._windows is not None:
+            self.export_series()
+        if self._samples:
+            with self._stats_lock:
+                buffers = list(self._sample_buffers)
+            if buffers and self.mode == "columnar":
+                write_columnar(self.samples_file, self._fids.names, buffers)
+            elif buffers:
+                write_samples(self.samples_file, list(self._fids.names), buffers)
+        split = self.async_split()
+        lags = self.loop_lags()
+        cpu = self.cpu_times()
+        gc_times = self._gc.per_function() if self._gc is not None else {}
+        slowest = self.slowest_calls()
+        if not self._buffer and not aggregates and not self._unwrapped and not split and not lags and not cpu \
+                and not gc_times and not slowest and not (
+                self._samples and self._governor is not None):
+            return
+        if self._aggregate:
+            lines = self._aggregate_lines(aggregates)
+        elif self._samples:
+            lines = []
+        else:
+            lines = [self._format_record(r) for r in self._buffer]
+        for name, (calls, total, rate, wrapped_rate, window, since) in self.unwrapped_estimates().items():
+            lines.append(f"[Perf] {name} unwrapped (hot): {wrapped_rate:.0f} calls/s while wrapped over a "
+                         f"{window:.6f}s window; unwrapped at least {rate:.0f} calls/s, so at least ~{calls} "
+                         f"calls over the {since:.3f}s since (lower bound, not observed), ~{total:.6f}s "
+                         f"at the wrapped mean duration\n")
+        for name, (calls, wall, cpu_s, ratio) in sorted(cpu.items()):
+            lines.append(f"[Perf] {name} cpu calls={calls} wall={wall:.6f}s cpu={cpu_s:.6f}s cpu/wall={ratio:.2f}\n")
+        for name, (collections, pause) in sorted(gc_times.items()):
+            lines.append(f"[Perf] {name} gc collections={collections} pause={pause:.6f}s\n")
+        for name, (calls, active, suspended) in sorted(split.items()):
+            lines.append(f"[Perf] {name} async calls={calls} active={active:.6f}s suspended={suspended:.6f}s\n")
+        for name, (stalls, total, worst) in sorted(lags.items(), key=lambda kv: -kv[1][1]):
+            lines.append(f"[Perf] loop lag during {name}: stalls={stalls} total={total:.6f}s max={worst:.6f}s\n")
+        for name, calls in sorted(slowest.items()):
+            for e in calls:
+                when = datetime.fromtimestamp(e.timestamp).isoformat(timespec="milliseconds")
+                lines.append(f"[Perf] {name} slow {e.duration_ns / 1e9:.6f}s at {when} thread={e.thread} "
+                             f"caller={e.caller} args=({e.args})\n")
+        if self._governor is not None:
+            lines.extend(self._sampled_summary(aggregates))
+        # Snapshots run this on a copy with another outfile; only the live dump finishes the stream
+        if self._stream is not None and self._stream.path == self.outfile:
+            self._stream.write_now(lines)
+            self._stream.close()
             return
-        lines = [f"[Perf] {name} took {dur:.6f}s\n" for name, dur in self._buffer]
         with open(self.outfile, "a") as f:
             f.writelines(lines)
 
+    def _dump_call_tree(self) -> None:
+        root = self.call_tree()
+        if not root.children:
+            return
+        with open(self.folded_file, "w") as f:
+            f.writelines(line + "\n" for line in root.collapsed())
+        with open(self.tree_file, "w") as f:
+            json.dump(root.to_dict(), f, indent=2)
+
+    @staticmethod
+    def _aggregate_lines(aggregates: Dict[str, LogHistogram]) -> List[str]:
+        lines = []
+        for name, h in sorted(aggregates.items()):
+            p = h.percentiles()
+            lines.append(
+                f"[Perf] {name} calls={h.count} total={h.total / 1e9:.6f}s "
+                f"mean={h.mean / 1e9:.6f}s min={(h.min or 0) / 1e9:.6f}s max={h.max / 1e9:.6f}s "
+                f"p50={p[0.5] / 1e9:.6f}s p90={p[0.9] / 1e9:.6f}s "
+                f"p99={p[0.99] / 1e9:.6f}s p999={p[0.999] / 1e9:.6f}s\n"
+            )
+        return lines
+
+    def _sampled_summary(self, aggregates: Dict[str, LogHistogram]) -> List[str]:
+        """
+        Extrapolated per-function totals (with ~95% error bars) for sampled runs.
+        """
+        gov = self._governor
+        # module.func -> (n, mean seconds, variance seconds²)
+        moments: Dict[str, Tuple[int, float, float]] = {}
+        if self._aggregate:
+            for name, h in aggregates.items():
+                moments[name] = (h.count, h.mean / 1e9, h.variance / 1e18)
+        else:
+            per_fn: Dict[str, List[float]] = {}
+            for name, dur in self.results():
+                per_fn.setdefault(name, []).append(dur)
+            for name, durs in per_fn.items():
+                n = len(durs)
+                mean = sum(durs) / n
+                var = sum((d - mean) ** 2 for d in durs) / (n - 1) if n > 1 else 0.0
+                moments[name] = (n, mean, var)
+        lines = []
+        for name, (n, mean, var) in sorted(moments.items()):
+            seen, sampled = gov.counts(name)
+            if seen <= n:
+                continue
+            total, err = gov.extrapolate(seen, n, mean, var)
+            lines.append(f"[Perf] {name} sampled {n}/{seen} calls, "
+                         f"est. total {total:.6f}s ± {err:.6f}s\n")
+        lines.append(f"[Perf] governor overhead {gov.overhead():.2%} of wall time in analysis callbacks after the "
+                     f"first window (last window {gov.last_overhead:.2%}, {gov.overhead(warmup=True):.2%} including "
+                     f"it; budget {gov.budget:.2%}); whole hook dispatch {gov.dispatch_overhead():.2%} "
+                     f"(wrapper frames and C profiling not measured)\n")
+        return lines
+
 
 class TypeExtractor(Analysis):
     """
     Extracts return types of each function call with zero I/O overhead during execution.
-    Buffers type info in memory and dumps to file at program exit.
+    Buffers type info in memory and dumps to file at program exit, or streams it
+    through the HookManager's LogFlusher when there is one.
     """
     def __init__(self, outfile: str = "types.log") -> None:
         self.outfile = outfile
@@ -75,16 +552,27 @@ class TypeExtractor(Analysis):
         
         # Buffer for (module.func, type_name) tuples
         self._buffer: List[Tuple[str, str]] = []
+        self._emit = self._buffer.append
+        self._stream = None
         # Register dump at program exit
         atexit.register(self._dump)
 
+    def on_install(self, hook_mgr):
+        if hook_mgr.flusher is not None:
+            self._stream = hook_mgr.flusher.stream(self.outfile, self._format_record)
+            self._emit = self._stream.write
+
     def on_return(self, module: str, func: str, result: Any) -> None:
         # Skip library internals, only log user code
         if any(module.startswith(prefix) for prefix in self.exclude_prefixes):
             return
         
         # Buffer the type information instead of writing immediately
-        self._buffer.append((f"{module}.{func}", type(result).__name__))
+        self._emit((f"{module}.{func}", type(result).__name__))
+
+    @staticmethod
+    def _format_record(record: Tuple[str, str]) -> str:
+        return f"[Type] {record[0]} returned {record[1]}\n"
     
     def results(self) -> List[Tuple[str, str]]:
         """
@@ -97,10 +585,945 @@ class TypeExtractor(Analysis):
         """
         Writes all buffered type information to the output file in one batch.
         """
+        if self._stream is not None and self._stream.path == self.outfile:
+            self._stream.close()
+            return
+        if not self._buffer:
+            return
+        with open(self.outfile, "w") as f:
+            f.writelines(self._format_record(r) for r in list(self._buffer))
+
+
+
+class TimelineAnalyzer(Analysis):
+    """
+    Records begin/end events per call with thread and nanosecond timestamps in
+    a fixed-size ring per thread, and exports them at program exit as Chrome
+    Trace Event JSON (open in chrome://tracing or ui.perfetto.dev).
+    """
+    # Ask install_hooks to profile C calls on threads started later too
+    thread_c_calls = True
+
+    def __init__(self, outfile: str = "timeline.json", capacity: int = 1 << 18) -> None:
+        self.outfile = os.path.splitext(outfile)[0] + ".json"
+        self.capacity = capacity
+        self._local = threading.local()
+        self._fids = FunctionIds()
+        self._rings: List[EventRing] = []
+        self._lock = threading.Lock()
+        self._origin_ns = perf_counter_ns()
+        self._c_ext_modules: set = set()
+        atexit.register(self._dump)
+
+    def on_install(self, hook_mgr):
+        # C-extension calls reach us through HookManager.c_profile
+        self._c_ext_modules = hook_mgr.c_ext_modules
+
+    def _ring(self) -> EventRing:
+        ring = getattr(self._local, "ring", None)
+        if ring is None:
+            t = threading.current_thread()
+            ring = self._local.ring = EventRing(t.ident, t.name, self.capacity)
+            with self._lock:
+                self._rings.append(ring)
+        return ring
+
+    def on_call(self, module, func, args, kwargs):
+        self._ring().add(perf_counter_ns(), self._fids.get(module, func), BEGIN)
+
+    def on_return(self, module, func, result):
+        self._ring().add(perf_counter_ns(), self._fids.get(module, func), END)
+
+    def on_raise(self, module, func, exc):
+        # A call that raises still ends its slice
+        self._ring().add(perf_counter_ns(), self._fids.get(module, func), END)
+
+    def _category(self, name: str) -> str:
+        return "c" if name.rpartition(".")[0] in self._c_ext_modules else "py"
+
+    def _dump(self) -> None:
+        with self._lock:
+            rings = list(self._rings)
+        if not rings:
+            return
+        trace = chrome_trace(rings, self._fids.names, self._origin_ns, self._category, os.getpid())
+        with open(self.outfile, "w") as f:
+            json.dump(trace, f)
+
+
+class SpanAnalyzer(Analysis):
+    """
+    Opens a child span (see Cerbex.spans) for every wrapped call, so each call
+    carries a trace/span ID that follows threads, executors and asyncio tasks.
+    Finished spans, including user spans, are written as JSON lines at exit,
+    or streamed through the HookManager's LogFlusher when there is one.
+    """
+    def __init__(self, outfile: str = "spans.jsonl") -> None:
+        self.outfile = os.path.splitext(outfile)[0] + ".jsonl"
+        self.exclude_prefixes = {
+            'builtins', '__builtins__', 'fastapi', 'pydantic',
+            'starlette', '_json'
+        }
+        self._buffer: List[Span] = []
+        self._emit = self._buffer.append
+        self._stream = None
+        self._c_ext_modules: set = set()
+        spans._sinks.append(self._sink)
+        spans.install_propagation()
+        atexit.register(self._dump)
+
+    def on_install(self, hook_mgr):
+        # Only Python-level wrapped calls get spans, not C calls from c_profile
+        self._c_ext_modules = hook_mgr.c_ext_modules
+        if hook_mgr.flusher is not None:
+            self._stream = hook_mgr.flusher.stream(self.outfile, self._format_span)
+            self._emit = self._stream.write
+
+    def _sink(self, span: Span) -> None:
+        self._emit(span)
+
+    def on_call(self, module, func, args, kwargs):
+        if module.startswith(tuple(self.exclude_prefixes)) or module in self._c_ext_modules:
+            return
+        spans.start_span(f"{module}.{func}")
+
+    def on_return(self, module, func, result):
+        if module.startswith(tuple(self.exclude_prefixes)) or module in self._c_ext_modules:
+            return
+        spans.end_span(f"{module}.{func}")
+
+    def on_raise(self, module, func, exc):
+        # Otherwise the failed call's span would stay current and parent later calls
+        self.on_return(module, func, None)
+
+    def results(self) -> List[Span]:
+        return list(self._buffer)
+
+    @staticmethod
+    def _format_span(s: Span) -> str:
+        return json.dumps({
+            "trace_id": f"{s.trace_id:016x}",
+            "span_id": s.span_id,
+            "parent_id": s.parent_id,
+            "name": s.name,
+            "thread": s.thread,
+            "start_ns": s.start_ns,
+            "duration_ns": s.end_ns - s.start_ns,
+        }) + "\n"
+
+    def _dump(self) -> None:
+        if self._stream is not None and self._stream.path == self.outfile:
+            self._stream.close()
+            return
         if not self._buffer:
             return
+        with open(self.outfile, "w") as f:
+            f.writelines(self._format_span(s) for s in list(self._buffer))
+
+
+class GCAnalyzer(Analysis):
+    """
+    Attributes garbage-collector pauses to wrapped functions through gc.callbacks.
+    Each pause is charged to the innermost function on the collecting thread's
+    stack (the allocation that triggered it); innermost functions of other threads
+    are charged the same time as "stalled", since collections hold the GIL.
+    Per-function totals per generation, and every full (gen 2) collection, are
+    written at exit.
+    """
+    def __init__(self, outfile: str = "gc.log") -> None:
+        self.outfile = outfile
+        self._local = threading.local()
+        # thread ident -> that thread's stack of (module, func)
+        self._stacks: Dict[int, List[Tuple[str, str]]] = {}
+        self._lock = threading.Lock()
+        self._start_ns = 0
+        # (module.func, generation) -> [collections, pause ns, max ns, collected, uncollectable]
+        self._pauses: Dict[Tuple[str, int], List[int]] = {}
+        # module.func -> ns stalled by collections triggered on other threads
+        self._stalled: Dict[str, int] = {}
+        # Full collections: (module.func, duration ns, collected, uncollectable)
+        self.full_collections: List[Tuple[str, int, int, int]] = []
+        gc.callbacks.append(self._callback)
+        atexit.register(self._dump)
+
+    def _stack(self) -> List[Tuple[str, str]]:
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+            with self._lock:
+                self._stacks[threading.get_ident()] = stack
+        return stack
+
+    def on_call(self, module, func, args, kwargs):
+        self._stack().append((module, func))
+
+    def on_return(self, module, func, result):
+        stack = self._stack()
+        if stack and stack[-1] == (module, func):
+            stack.pop()
+
+    def on_raise(self, module, func, exc):
+        # A raising call is off the stack as much as a returning one
+        self.on_return(module, func, None)
+
+    def _callback(self, phase: str, info: Dict[str, int]) -> None:
+        if phase == "start":
+            self._start_ns = perf_counter_ns()
+            return
+        duration = perf_counter_ns() - self._start_ns
+        me = threading.get_ident()
+        culprit = "<outside wrapped code>"
+        for ident, stack in list(self._stacks.items()):
+            if not stack:
+                continue
+            name = "%s.%s" % stack[-1]
+            if ident == me:
+                culprit = name
+            else:
+                self._stalled[name] = self._stalled.get(name, 0) + duration
+        gen = info.get("generation", 0)
+        entry = self._pauses.get((culprit, gen))
+        if entry is None:
+            entry = self._pauses[(culprit, gen)] = [0, 0, 0, 0, 0]
+        entry[0] += 1
+        entry[1] += duration
+        entry[2] = max(entry[2], duration)
+        entry[3] += info.get("collected", 0)
+        entry[4] += info.get("uncollectable", 0)
+        if gen == 2:
+            self.full_collections.append((culprit, duration, info.get("collected", 0),
+                                          info.get("uncollectable", 0)))
+
+    def per_function(self) -> Dict[str, Tuple[int, float]]:
+        """
+        Returns module.func -> (collections triggered, pause seconds), all generations.
+        """
+        out: Dict[str, List[float]] = {}
+        for (name, _), (count, total, _, _, _) in list(self._pauses.items()):
+            entry = out.setdefault(name, [0, 0])
+            entry[0] += count
+            entry[1] += total
+        return {name: (int(count), total / 1e9) for name, (count, total) in out.items()}
+
+    def _dump(self) -> None:
+        try:
+            gc.callbacks.remove(self._callback)
+        except ValueError:
+            pass
+        self._write()
+
+    def _write(self) -> None:
+        if not self._pauses:
+            return
+        lines = []
+        for (name, gen), (count, total, worst, collected, uncollectable) in sorted(
+                list(self._pauses.items()), key=lambda kv: -kv[1][1]):
+            lines.append(f"[GC] {name} gen{gen} collections={count} pause={total / 1e9:.6f}s "
+                         f"max={worst / 1e9:.6f}s collected={collected} uncollectable={uncollectable}\n")
+        for name, stalled in sorted(list(self._stalled.items()), key=lambda kv: -kv[1]):
+            lines.append(f"[GC] {name} stalled={stalled / 1e9:.6f}s by collections on other threads\n")
+        for name, duration, collected, uncollectable in list(self.full_collections):
+            lines.append(f"[GC] full collection during {name}: {duration / 1e9:.6f}s "
+                         f"collected={collected} uncollectable={uncollectable}\n")
+        with open(self.outfile, "w") as f:
+            f.writelines(lines)
+
+
+class LockAnalyzer(Analysis):
+    """
+    Lock contention for threaded targets. Locks, RLocks, Conditions and Queues
+    are tracked wherever they were created (see Cerbex.locks); every acquire/get
+    made inside a wrapped call records its wait and every release its hold
+    time, per innermost wrapped function of the acquiring thread and per
+    creation site. Reports the most contended sites and the functions holding
+    locks longest.
+    """
+    def __init__(self, outfile: str = "locks.log", top: int = 20) -> None:
+        self.outfile = outfile
+        self.top = top
+        self._local = threading.local()
+        self._lock = locks._native_lock()
+        # site -> [kind, acquisitions, contended, wait ns, max wait ns, hold ns, max hold ns]
+        self._sites: Dict[str, list] = {}
+        # module.func -> [acquisitions, contended, wait ns, hold ns]
+        self._funcs: Dict[str, List[int]] = {}
+        self._c_ext_modules: set = set()
+        atexit.register(self._dump)
+
+    def on_install(self, hook_mgr):
+        self._c_ext_modules = hook_mgr.c_ext_modules
+        locks.install(self._record, self._active)
+
+    def on_call(self, module, func, args, kwargs):
+        # C calls (e.g. builtins.exec running the whole script) never acquire locks themselves
+        if module in self._c_ext_modules:
+            return
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        stack.append(f"{module}.{func}")
+
+    def on_return(self, module, func, result):
+        if module in self._c_ext_modules:
+            return
+        stack = getattr(self._local, "stack", None)
+        if stack:
+            stack.pop()
+
+    def on_raise(self, module, func, exc):
+        self.on_return(module, func, None)
+
+    def _active(self) -> bool:
+        return bool(getattr(self._local, "stack", None))
+
+    def _record(self, kind: str, site: str, wait_ns: int, contended: bool, hold_ns: int) -> None:
+        stack = getattr(self._local, "stack", None)
+        func = stack[-1] if stack else "<outside wrapped code>"
+        with self._lock:
+            s = self._sites.get(site)
+            if s is None:
+                s = self._sites[site] = [kind, 0, 0, 0, 0, 0, 0]
+            f = self._funcs.get(func)
+            if f is None:
+                f = self._funcs[func] = [0, 0, 0, 0]
+            if hold_ns >= 0:
+                s[5] += hold_ns
+                s[6] = max(s[6], hold_ns)
+                f[3] += hold_ns
+                return
+            s[1] += 1
+            s[3] += wait_ns
+            s[4] = max(s[4], wait_ns)
+            f[0] += 1
+            f[2] += wait_ns
+            if contended:
+                s[2] += 1
+                f[1] += 1
+
+    def sites(self) -> Dict[str, Tuple[str, int, int, float, float, float, float]]:
+        """
+        Returns site -> (kind, acquisitions, contended, wait s, max wait s, hold s, max hold s).
+        """
+        with self._lock:
+            items = [(site, list(v)) for site, v in self._sites.items()]
+        return {site: (kind, n, c, w / 1e9, mw / 1e9, h / 1e9, mh / 1e9)
+                for site, (kind, n, c, w, mw, h, mh) in items}
+
+    def functions(self) -> Dict[str, Tuple[int, int, float, float]]:
+        """
+        Returns module.func -> (acquisitions, contended, wait s, hold s).
+        """
+        with self._lock:
+            items = [(name, list(v)) for name, v in self._funcs.items()]
+        return {name: (n, c, w / 1e9, h / 1e9) for name, (n, c, w, h) in items}
+
+    def _dump(self) -> None:
+        sites = self.sites()
+        if not sites:
+            return
+        lines = ["[Locks] most contended:\n"]
+        for site, (kind, n, c, w, mw, h, mh) in sorted(sites.items(), key=lambda kv: -kv[1][3])[:self.top]:
+            lines.append(f"[Locks] {kind} {site} acquires={n} contended={c} wait={w:.6f}s "
+                         f"max_wait={mw:.6f}s hold={h:.6f}s max_hold={mh:.6f}s\n")
+        lines.append("[Locks] longest holders:\n")
+        for name, (n, c, w, h) in sorted(self.functions().items(), key=lambda kv: -kv[1][3])[:self.top]:
+            lines.append(f"[Locks] {name} acquires={n} contended={c} wait={w:.6f}s hold={h:.6f}s\n")
+        with open(self.outfile, "w") as f:
+            f.writelines(lines)
+
+
+class IOAnalyzer(Analysis):
+    """
+    Attributes file and socket I/O to the innermost wrapped function (see
+    Cerbex.iotrack): audit events are counted, and reads/writes/sends/recvs are
+    timed with their sizes. Reports per function and per file or host.
+    """
+    def __init__(self, outfile: str = "io.log", top: int = 20) -> None:
+        self.outfile = outfile
+        self.top = top
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        # (module.func, target, op) -> [count, bytes, ns]
+        self._stats: Dict[Tuple[str, str, str], List[int]] = {}
+        self._c_ext_modules: set = set()
+        # HookManager's thread state: in_hook is set while Cerbex does its own work
+        self._hook_local = threading.local()
+        iotrack.install(self._record, self._active)
+        atexit.register(self._dump)
+
+    def on_install(self, hook_mgr):
+        # C calls such as io.open are the I/O itself; charge the Python caller
+        self._c_ext_modules = hook_mgr.c_ext_modules
+        self._hook_local = hook_mgr._local
+
+    def on_call(self, module, func, args, kwargs):
+        if module in self._c_ext_modules:
+            return
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        stack.append(f"{module}.{func}")
+
+    def on_return(self, module, func, result):
+        if module in self._c_ext_modules:
+            return
+        stack = getattr(self._local, "stack", None)
+        if stack:
+            stack.pop()
+
+    def on_raise(self, module, func, exc):
+        self.on_return(module, func, None)
+
+    def _active(self) -> bool:
+        # Cerbex's own writes (hooks, snapshots, exit-time reports) run with in_hook set
+        return bool(getattr(self._local, "stack", None)) and not getattr(self._hook_local, "in_hook", False)
+
+    def _record(self, op: str, target: str, nbytes: int, ns: int) -> None:
+        stack = getattr(self._local, "stack", None)
+        if not stack or getattr(self._hook_local, "in_hook", False):
+            return
+        key = (stack[-1], target, op)
+        with self._lock:
+            entry = self._stats.get(key)
+            if entry is None:
+                entry = self._stats[key] = [0, 0, 0]
+            entry[0] += 1
+            entry[1] += nbytes or 0
+            entry[2] += ns
+
+    def breakdown(self, by: str = "function") -> Dict[str, Dict[str, Tuple[int, int, float]]]:
+        """
+        Returns {module.func or target: {op: (count, bytes, seconds)}}; `by` is
+        "function" or "target" (file path or host:port).
+        """
+        with self._lock:
+            items = [(k, list(v)) for k, v in self._stats.items()]
+        out: Dict[str, Dict[str, List[int]]] = {}
+        for (func, target, op), (count, nbytes, ns) in items:
+            ops = out.setdefault(func if by == "function" else target, {})
+            entry = ops.setdefault(op, [0, 0, 0])
+            entry[0] += count
+            entry[1] += nbytes
+            entry[2] += ns
+        return {k: {op: (c, b, ns / 1e9) for op, (c, b, ns) in ops.items()} for k, ops in out.items()}
+
+    def _lines(self, title: str, table: Dict[str, Dict[str, Tuple[int, int, float]]]) -> List[str]:
+        lines = [f"[IO] {title}:\n"]
+        ranked = sorted(table.items(), key=lambda kv: -sum(t for _, _, t in kv[1].values()))
+        for name, ops in ranked[:self.top]:
+            parts = " ".join(f"{op}={c}/{b}B/{t:.6f}s" for op, (c, b, t) in sorted(ops.items()))
+            lines.append(f"[IO] {name} {parts}\n")
+        return lines
+
+    def _dump(self) -> None:
+        iotrack.uninstall()
+        self._write()
+
+    def _write(self) -> None:
+        by_function = self.breakdown("function")
+        if not by_function:
+            return
+        lines = self._lines("per function (op=count/bytes/time)", by_function)
+        lines += self._lines("per file or host", self.breakdown("target"))
+        with open(self.outfile, "w") as f:
+            f.writelines(lines)
+
+
+# Python < 3.9 cannot reset the peak: nested calls then report the peak since
+# the outermost sampled call started
+_reset_peak = getattr(tracemalloc, "reset_peak", lambda: None)
+
+
+class MemAnalyzer(Analysis):
+    """
+    Per-function memory allocation with tracemalloc, sampled to bound overhead.
+
+    Every `sample_every`-th outermost call of a function (the first one
+    included) starts tracemalloc with `frames` frames and stops it on return,
+    so nothing is traced between sampled calls. Inside a sampled call, every
+    nested wrapped call is measured too:
+
+      - net: bytes still allocated at return (inclusive, and exclusive of
+        nested wrapped calls)
+      - peak: highest traced memory above the call's starting point
+      - blocks: live allocations whose most recent frame is in the function
+        (inclusive counts need frames > 1)
+
+    At the end of each sampled call the live traces are grouped by line, giving
+    the top allocating lines of each hot function. Only one sampled call is
+    traced at a time; allocations by other threads meanwhile are included, and
+    nested calls carry a few hundred bytes of hook bookkeeping.
+    """
+    def __init__(self, outfile: str = "mem.log", sample_every: int = 100, frames: int = 1,
+                 top_functions: int = 10, top_lines: int = 5) -> None:
+        self.outfile = outfile
+        self.sample_every = max(1, sample_every)
+        self.frames = max(1, frames)
+        self.top_functions = top_functions
+        self.top_lines = top_lines
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._owner: Optional[int] = None
+        self._calls: Dict[str, int] = {}
+        # module.func -> [sampled calls, net incl, net excl, peak max, peak sum, blocks excl, blocks incl]
+        self._stats: Dict[str, List[int]] = {}
+        # module.func -> {"file:line": [bytes, blocks]}
+        self._lines: Dict[str, Dict[str, List[int]]] = {}
+        self._wrapper_codes = wrapper_codes()
+        self._lines_by_code: Dict[Any, set] = {}
+        self._c_ext_modules: set = set()
+        atexit.register(self._dump)
+
+    def on_install(self, hook_mgr):
+        self._c_ext_modules = hook_mgr.c_ext_modules
+
+    def _target_code(self):
+        fn = wrapped_function(sys._getframe(2), self._wrapper_codes)
+        return getattr(fn, "__code__", None)
+
+    def _code_lines(self, code) -> set:
+        lines = self._lines_by_code.get(code)
+        if lines is None:
+            if hasattr(code, "co_lines"):
+                lines = {line for _, _, line in code.co_lines() if line}
+            else:  # Python < 3.10
+                lines = {line for _, line in dis.findlinestarts(code) if line}
+            self._lines_by_code[code] = lines
+        return lines
+
+    def on_call(self, module, func, args, kwargs):
+        if module in self._c_ext_modules:
+            return
+        name = f"{module}.{func}"
+        frames = getattr(self._local, "frames", None)
+        if frames:
+            # Nested call inside this thread's sampled call: measure it as well.
+            # Memory is read last here and first in on_return, so the hook's own
+            # bookkeeping lands outside the measured window.
+            parent = frames[-1]
+            self._calls[name] = self._calls.get(name, 0) + 1
+            frame = [name, self._target_code(), 0, 0, 0]
+            frames.append(frame)
+            current, peak = tracemalloc.get_traced_memory()
+            parent[3] = max(parent[3], peak)
+            _reset_peak()
+            frame[2] = frame[3] = current
+            return
+        count = self._calls.get(name, 0) + 1
+        self._calls[name] = count
+        if count % self.sample_every != 1 and self.sample_every != 1:
+            return
+        with self._lock:
+            if self._owner is not None or tracemalloc.is_tracing():
+                return  # another sampled call (or the program itself) is tracing
+            self._owner = threading.get_ident()
+        self._local.code_index = {}
+        self._local.frames = [[name, self._target_code(), 0, 0, 0]]
+        tracemalloc.start(self.frames)
+
+    def on_return(self, module, func, result):
+        if module in self._c_ext_modules:
+            return
+        frames = getattr(self._local, "frames", None)
+        if not frames:
+            return
+        current, now_peak = tracemalloc.get_traced_memory()
+        name, code, start, peak, child_net = frames.pop()
+        peak = max(peak, now_peak)
+        net = current - start
+        if code is not None:
+            self._local.code_index.setdefault(code.co_filename, {})[name] = self._code_lines(code)
+        with self._lock:
+            entry = self._stats.get(name)
+            if entry is None:
+                entry = self._stats[name] = [0, 0, 0, 0, 0, 0, 0]
+            entry[0] += 1
+            entry[1] += net
+            entry[2] += net - child_net
+            entry[3] = max(entry[3], peak - start)
+            entry[4] += peak - start
+        if frames:
+            parent = frames[-1]
+            parent[3] = max(parent[3], peak)
+            parent[4] += net
+            _reset_peak()
+            return
+        # Outermost sampled call finished: attribute live blocks, then stop tracing
+        try:
+            snapshot = tracemalloc.take_snapshot()
+        finally:
+            tracemalloc.stop()
+            self._local.frames = None
+            with self._lock:
+                self._owner = None
+        self._attribute(snapshot, self._local.code_index)
+
+    def on_raise(self, module, func, exc):
+        # Measured up to the exception like a return; the outermost one stops tracing
+        self.on_return(module, func, None)
+
+    def _attribute(self, snapshot, index: Dict[str, Dict[str, set]]) -> None:
+        def owner(frame):
+            for name, lines in index.get(frame.filename, {}).items():
+                if frame.lineno in lines:
+                    return name
+            return None
+
+        with self._lock:
+            for trace in snapshot.traces:
+                tb = trace.traceback
+                # Frames are ordered oldest first; the allocating line is last
+                innermost = tb[-1]
+                name = owner(innermost)
+                if name is not None:
+                    self._stats[name][5] += 1
+                    line = self._lines.setdefault(name, {}).setdefault(
+                        f"{innermost.filename}:{innermost.lineno}", [0, 0])
+                    line[0] += trace.size
+                    line[1] += 1
+                for fname in {owner(f) for f in tb} - {None}:
+                    self._stats[fname][6] += 1
+
+    def results(self) -> Dict[str, Dict[str, float]]:
+        """
+        Returns module.func -> per-sampled-call averages and totals.
+        """
+        with self._lock:
+            items = [(name, list(v)) for name, v in self._stats.items()]
+        out = {}
+        for name, (n, net, excl, peak_max, peak_sum, blocks, blocks_incl) in items:
+            out[name] = {
+                "calls": self._calls.get(name, n),
+                "sampled": n,
+                "net_incl": net / n,
+                "net_excl": excl / n,
+                "peak_mean": peak_sum / n,
+                "peak_max": peak_max,
+                "blocks_excl": blocks / n,
+                "blocks_incl": blocks_incl / n,
+            }
+        return out
+
+    def _dump(self) -> None:
+        results = self.results()
+        if not results:
+            return
+        lines = []
+        ranked = sorted(results.items(), key=lambda kv: -kv[1]["peak_mean"])
+        for name, r in ranked:
+            lines.append(
+                f"[Mem] {name} sampled={r['sampled']}/{r['calls']} net_incl={r['net_incl']:.0f}B "
+                f"net_excl={r['net_excl']:.0f}B peak_mean={r['peak_mean']:.0f}B peak_max={r['peak_max']}B "
+                f"blocks_excl={r['blocks_excl']:.1f} blocks_incl={r['blocks_incl']:.1f}\n")
+        for name, _ in ranked[:self.top_functions]:
+            top = sorted(self._lines.get(name, {}).items(), key=lambda kv: -kv[1][0])[:self.top_lines]
+            for where, (size, blocks) in top:
+                lines.append(f"[Mem] {name} line {where} live={size}B blocks={blocks}\n")
+        with open(self.outfile, "w") as f:
+            f.writelines(lines)
+
+
+class SampleAnalyzer(Analysis):
+    """
+    Statistical stack sampler. A daemon thread reads sys._current_frames() `hz`
+    times a second and keeps only frames whose module is a config.json target,
+    so its cost depends on the sampling rate, not on how many calls the program
+    makes. Each sample counts once for the innermost target function (self) and
+    once for every target function on the stack (total), and the target-only
+    stack is counted as a collapsed line. Samples are wall-clock: threads that
+    are blocked are sampled too. Use with install_hooks(wrap=False) (CLI
+    --no-wrap) to profile without wrapping anything.
+    """
+    def __init__(self, outfile: str = "sample.log", hz: float = 100.0) -> None:
+        self.outfile = outfile
+        self.folded_file = os.path.splitext(outfile)[0] + ".folded"
+        self.interval = 1.0 / hz
+        self._targets: Tuple[str, ...] = ()
+        # code object -> "module.qualname", or None when not in a target module
+        self._names: Dict[Any, Optional[str]] = {}
+        self.self_samples: Dict[str, int] = {}
+        self.total_samples: Dict[str, int] = {}
+        self.stacks: Dict[str, int] = {}
+        self.samples = 0
+        self._busy_ns = 0
+        self._started_ns = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        atexit.register(self._dump)
+
+    def on_install(self, hook_mgr):
+        self._targets = tuple(hook_mgr.targets)
+        self._started_ns = perf_counter_ns()
+        self._thread = threading.Thread(target=self._run, name="cerbex-sampler", daemon=True)
+        self._thread.start()
+
+    def _name(self, frame) -> Optional[str]:
+        code = frame.f_code
+        try:
+            return self._names[code]
+        except KeyError:
+            pass
+        module = frame.f_globals.get("__name__", "")
+        name = None
+        if matches_target(module, self._targets):
+            name = f"{module}.{getattr(code, 'co_qualname', code.co_name)}"
+        self._names[code] = name
+        return name
+
+    def _run(self) -> None:
+        me = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            t0 = perf_counter_ns()
+            for ident, frame in sys._current_frames().items():
+                if ident != me:
+                    self._sample(frame)
+            self._busy_ns += perf_counter_ns() - t0
+
+    def _sample(self, frame) -> None:
+        path = []
+        while frame is not None:
+            name = self._name(frame)
+            if name is not None:
+                path.append(name)
+            frame = frame.f_back
+        if not path:
+            return
+        self.samples += 1
+        self.self_samples[path[0]] = self.self_samples.get(path[0], 0) + 1
+        for name in set(path):
+            self.total_samples[name] = self.total_samples.get(name, 0) + 1
+        stack = ";".join(reversed(path))
+        self.stacks[stack] = self.stacks.get(stack, 0) + 1
+
+    def overhead(self) -> float:
+        """Share of wall time spent taking samples so far."""
+        elapsed = perf_counter_ns() - self._started_ns
+        return self._busy_ns / elapsed if elapsed > 0 else 0.0
+
+    def _dump(self) -> None:
+        self._stop.set()
+        self._write()
+
+    def _write(self) -> None:
+        if not self.samples:
+            return
+        total = self.samples
+        lines = []
+        for name, n in sorted(self.total_samples.items(), key=lambda kv: -self.self_samples.get(kv[0], 0)):
+            own = self.self_samples.get(name, 0)
+            lines.append(f"[Sample] {name} self={own} ({own / total:.1%}) total={n} ({n / total:.1%})\n")
+        lines.append(f"[Sample] {total} samples at {1 / self.interval:.0f} Hz, "
+                     f"sampler overhead {self.overhead():.2%} of wall time\n")
+        with open(self.outfile, "w") as f:
+            f.writelines(lines)
+        with open(self.folded_file, "w") as f:
+            f.writelines(f"{stack} {n}\n" for stack, n in sorted(self.stacks.items()))
+
+
+class LineProfiler(Analysis):
+    """
+    Per-line hits and time inside selected functions, named in config.json as
+    "analysis_options": {"lines": {"functions": ["module.func", "module.Class.method"]}}.
+    Only those code objects are traced (see Cerbex.lineprof); the rest of the
+    process runs at normal speed.
+    """
+    def __init__(self, outfile: str = "lines.log", functions: Optional[List[str]] = None) -> None:
+        self.outfile = outfile
+        self.functions = set(functions or ())
+        # Cheap pre-filter on the bare function name before resolving the code object
+        self._short_names = {name.rpartition(".")[2] for name in self.functions}
+        self.times = LineTimes()
+        self._backend = line_backend(self.times) if self.functions else None
+        self._codes: Dict[Any, str] = {}
+        self._wrapper_codes = wrapper_codes()
+        atexit.register(self._dump)
+
+    def _selected(self, module: str, func: str) -> bool:
+        """
+        True if the innermost wrapped call is one of the selected functions;
+        its code object is registered with the backend the first time.
+        """
+        if func not in self._short_names or self._backend is None:
+            return False
+        fn = wrapped_function(sys._getframe(2), self._wrapper_codes)
+        code = getattr(fn, "__code__", None)
+        if code is None:
+            return False
+        if code not in self._codes:
+            qualname = getattr(fn, "__qualname__", func)
+            name = f"{module}.{qualname}"
+            if name not in self.functions and f"{module}.{func}" not in self.functions:
+                return False
+            self._codes[code] = name
+            self._backend.add(code)
+        return True
+
+    def on_call(self, module, func, args, kwargs):
+        if self._selected(module, func):
+            self._backend.enter()
+
+    def on_return(self, module, func, result):
+        if self._selected(module, func):
+            self._backend.exit()
+
+    def on_raise(self, module, func, exc):
+        # Without this a raising call would leave sys.settrace installed (TraceLines)
+        if self._selected(module, func):
+            self._backend.exit()
+
+    def results(self) -> Dict[str, Dict[int, Tuple[int, float]]]:
+        """
+        Returns module.func -> {line: (hits, total seconds)}.
+        """
+        out = {}
+        for code, lines in self.times.merged().items():
+            name = self._codes.get(code, code.co_qualname if hasattr(code, "co_qualname") else code.co_name)
+            out[name] = {line: (hits, ns / 1e9) for line, (hits, ns) in lines.items()}
+        return out
+
+    def _dump(self) -> None:
+        merged = self.times.merged()
+        if not merged:
+            return
+        out = []
+        for code, lines in sorted(merged.items(), key=lambda kv: -sum(ns for _, ns in kv[1].values())):
+            total = sum(ns for _, ns in lines.values())
+            out.append(f"[Lines] {self._codes.get(code, code.co_name)} ({code.co_filename}:{code.co_firstlineno}) "
+                       f"total={total / 1e9:.6f}s\n")
+            for line, (hits, ns) in sorted(lines.items()):
+                source = linecache.getline(code.co_filename, line).rstrip()
+                out.append(f"[Lines] {line:>6} hits={hits} total={ns / 1e9:.6f}s mean={ns / hits / 1e3:.3f}us "
+                           f"| {source}\n")
+        with open(self.outfile, "w") as f:
+            f.writelines(out)
 
 
+class ComplexityAnalyzer(Analysis):
+    """
+    Latency as a function of input size. Each call is sized from its first
+    sizeable argument (see Cerbex.complexity), durations are bucketed by
+    log2(size), and a growth model (O(1), O(n), O(n log n), O(n^2)) is fitted
+    per function. Functions whose best model grows faster than `flag_above`
+    (default O(n)) are flagged. Extra extractors can be given as
+    "module:function" names.
+    """
+    def __init__(self, outfile: str = "complexity.log", extractors: Optional[List[str]] = None,
+                 min_buckets: int = 3, flag_above: str = "O(n)") -> None:
+        if flag_above not in GROWTH_MODELS:
+            raise ValueError(f"Unknown complexity model {flag_above!r}, expected one of {tuple(GROWTH_MODELS)}")
+        self.outfile = outfile
+        self.min_buckets = min_buckets
+        # Models in MODELS order grow faster and faster; flag those after flag_above
+        models = list(GROWTH_MODELS)
+        self._flagged = set(models[models.index(flag_above) + 1:])
+        self.extractors = [load_extractor(path) for path in extractors or ()] + SIZE_EXTRACTORS
+        self._local = threading.local()
+        # One {module.func: {bucket: [calls, size sum, ns sum, min ns, size of min]}} per thread, merged at dump
+        self._thread_buckets: List[Dict[str, Dict[int, List[int]]]] = []
+        self._lock = threading.Lock()
+        atexit.register(self._dump)
+
+    def on_call(self, module, func, args, kwargs):
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        size = call_size(args, kwargs, self.extractors) if args or kwargs else None
+        stack.append((size, perf_counter_ns()))
+
+    def on_return(self, module, func, result):
+        now = perf_counter_ns()
+        stack = getattr(self._local, "stack", None)
+        if not stack:
+            return
+        size, start = stack.pop()
+        if size is None or size < 1:
+            return
+        buckets = getattr(self._local, "buckets", None)
+        if buckets is None:
+            buckets = self._local.buckets = {}
+            with self._lock:
+                self._thread_buckets.append(buckets)
+        name = f"{module}.{func}"
+        per_fn = buckets.get(name)
+        if per_fn is None:
+            per_fn = buckets[name] = {}
+        elapsed = now - start
+        entry = per_fn.get(size.bit_length())
+        if entry is None:
+            entry = per_fn[size.bit_length()] = [0, 0, 0, elapsed, size]
+        entry[0] += 1
+        entry[1] += size
+        entry[2] += elapsed
+        if elapsed < entry[3]:
+            entry[3] = elapsed
+            entry[4] = size
+
+    def on_raise(self, module, func, exc):
+        # Failed calls say nothing about growth; just drop the frame
+        stack = getattr(self._local, "stack", None)
+        if stack:
+            stack.pop()
+
+    def buckets(self) -> Dict[str, Dict[int, Tuple[int, float, float, int, float]]]:
+        """
+        Returns module.func -> {log2 bucket: (calls, mean size, mean seconds,
+        size of the fastest call, its seconds)}.
+        """
+        with self._lock:
+            per_thread = list(self._thread_buckets)
+        merged: Dict[str, Dict[int, List[int]]] = {}
+        for buckets in per_thread:
+            for name, per_fn in list(buckets.items()):
+                mine = merged.setdefault(name, {})
+                for b, (calls, size, ns, min_ns, min_size) in list(per_fn.items()):
+                    entry = mine.get(b)
+                    if entry is None:
+                        mine[b] = [calls, size, ns, min_ns, min_size]
+                        continue
+                    entry[0] += calls
+                    entry[1] += size
+                    entry[2] += ns
+                    if min_ns < entry[3]:
+                        entry[3], entry[4] = min_ns, min_size
+        return {name: {b: (c, size / c, ns / c / 1e9, min_size, min_ns / 1e9)
+                       for b, (c, size, ns, min_ns, min_size) in per_fn.items()}
+                for name, per_fn in merged.items()}
+
+    def fits(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Returns module.func -> fit_growth() result, for functions seen at
+        `min_buckets` or more distinct size buckets.
+        """
+        out = {}
+        for name, per_fn in self.buckets().items():
+            if len(per_fn) < self.min_buckets:
+                continue
+            out[name] = fit_growth([(min_size, min_secs, 1.0)
+                                    for _, _, _, min_size, min_secs in per_fn.values()])
+        return out
+
+    def _dump(self) -> None:
+        buckets = self.buckets()
+        if not buckets:
+            return
+        fits = self.fits()
+        lines = []
+        for name in sorted(buckets):
+            per_fn = buckets[name]
+            fit = fits.get(name)
+            sizes = [size for _, size, _, _, _ in per_fn.values()]
+            if fit is None:
+                lines.append(f"[Complexity] {name} too few size buckets ({len(per_fn)}) to fit\n")
+            else:
+                flag = " NOT SCALABLE" if fit["model"] in self._flagged else ""
+                lines.append(f"[Complexity] {name} best={fit['model']} r2={fit['r2']:.3f} "
+                             f"loglog_slope={fit['slope']:.2f} sizes={min(sizes):.0f}..{max(sizes):.0f}{flag}\n")
+            for b in sorted(per_fn):
+                calls, size, secs, _, min_secs = per_fn[b]
+                lines.append(f"[Complexity]   n~{size:.0f} calls={calls} mean={secs:.6f}s min={min_secs:.6f}s\n")
+        with open(self.outfile, "w") as f:
+            f.writelines(lines)
+
 
 class CustomDataFlowAnalyzer(Analysis):
     """
@@ -0,0 +1,112 @@
+# File: calltree.py
+"""
+Per-thread call trees keyed on the call stack, with recursion folding and
+inclusive/exclusive (self) time per node. Trees from all threads are merged
+for output as collapsed stacks (flamegraph input) or JSON.
+
+The stack of open calls is not part of the tree: enter() and exit() take and
+return the caller's top frame, so it can live in a ContextVar and interleaved
+asyncio tasks on one thread each keep their own position in the tree.
+"""
+from typing import Any, Dict, List, Optional, Tuple
+
+Key = Tuple[str, str]
+
+
+class CallNode:
+    __slots__ = ("key", "children", "calls", "inclusive_ns", "exclusive_ns", "path")
+
+    def __init__(self, key: Optional[Key], ancestors: Optional[Dict[Key, "CallNode"]] = None) -> None:
+        self.key = key
+        self.children: Dict[Key, "CallNode"] = {}
+        self.calls = 0
+        self.inclusive_ns = 0
+        self.exclusive_ns = 0
+        # Nodes of a live tree: key -> node for this node and its ancestors (recursion folding)
+        self.path: Optional[Dict[Key, "CallNode"]] = None
+        if ancestors is not None:
+            self.path = dict(ancestors)
+            if key is not None:
+                self.path[key] = self
+
+    @property
+    def name(self) -> str:
+        return f"{self.key[0]}.{self.key[1]}" if self.key else "<root>"
+
+    def merge(self, other: "CallNode") -> None:
+        self.calls += other.calls
+        self.inclusive_ns += other.inclusive_ns
+        self.exclusive_ns += other.exclusive_ns
+        for key, child in list(other.children.items()):
+            mine = self.children.get(key)
+            if mine is None:
+                mine = self.children[key] = CallNode(key)
+            mine.merge(child)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "calls": self.calls,
+            "inclusive_ns": self.inclusive_ns,
+            "exclusive_ns": self.exclusive_ns,
+            "children": [c.to_dict() for c in sorted(
+                self.children.values(), key=lambda c: c.inclusive_ns, reverse=True)],
+        }
+
+    def collapsed(self, prefix: str = "") -> List[str]:
+        """
+        Collapsed-stack lines "a;b;c <exclusive ns>" for this subtree.
+        """
+        lines = []
+        for child in self.children.values():
+            path = f"{prefix};{child.name}" if prefix else child.name
+            if child.exclusive_ns > 0:
+                lines.append(f"{path} {child.exclusive_ns}")
+            lines.extend(child.collapsed(path))
+        return lines
+
+
+class ThreadCallTree:
+    """
+    The call tree of a single thread. Re-entering a function that is already on
+    the stack folds into that node, so recursion does not deepen the tree and
+    inclusive time is only counted by the outermost activation.
+
+    Frames are [node, start_ns, child_ns, folded, tree, parent frame, open].
+    A context copied while a call was open (a task created inside it, a
+    span-propagated thread) still holds that frame after the call returns;
+    new calls attach to the nearest ancestor that is still open in this
+    thread's tree, or to the root.
+    """
+    __slots__ = ("root",)
+
+    def __init__(self) -> None:
+        self.root = CallNode(None, {})
+
+    def enter(self, key: Key, now: int, top: Optional[list]) -> list:
+        """Open a call of `key` under the caller's top frame; returns the new top."""
+        live = top
+        while live is not None and not (live[6] and live[4] is self):
+            live = live[5]
+        parent = live[0] if live is not None else self.root
+        node = parent.path.get(key)
+        folded = node is not None
+        if not folded:
+            node = parent.children.get(key)
+            if node is None:
+                node = parent.children[key] = CallNode(key, parent.path)
+        return [node, now, 0, folded, self, top, True]
+
+    @staticmethod
+    def exit(frame: list, now: int) -> Optional[list]:
+        """Close the call of `frame`; returns the caller's frame."""
+        node, start, child_ns, folded, tree, parent, _ = frame
+        frame[6] = False
+        duration = now - start
+        node.calls += 1
+        node.exclusive_ns += duration - child_ns
+        if not folded:
+            node.inclusive_ns += duration
+        if parent is not None and parent[6] and parent[4] is tree:
+            parent[2] += duration
+        return parent
@@ -1,11 +1,19 @@
 #cli.py
 import sys
+import json
 import runpy
 import argparse
 from pathlib import Path
 
-from Cerbex.hook_loader import install_hooks
-from Cerbex.analysis import PerfAnalyzer, TypeExtractor, CustomDataFlowAnalyzer
+from Cerbex.hook_loader import install_hooks, load_analysis_options
+from Cerbex.hook_manager import dump_reports
+from Cerbex.learn_store import LearnStore, is_learn_store
+from Cerbex.flusher import LogFlusher, POLICIES
+from Cerbex.analysis import (
+    PerfAnalyzer, TypeExtractor, CustomDataFlowAnalyzer, TimelineAnalyzer, SpanAnalyzer,
+    GCAnalyzer, LockAnalyzer, IOAnalyzer, MemAnalyzer, SampleAnalyzer, LineProfiler,
+    ComplexityAnalyzer,
+)
 
 __version__ = "0.1.0"
 
@@ -13,10 +21,137 @@ ANALYSIS_MAP = {
     "perf": PerfAnalyzer,
     "types": TypeExtractor,
     "dataflow": CustomDataFlowAnalyzer,
+    "timeline": TimelineAnalyzer,
+    "spans": SpanAnalyzer,
+    "gc": GCAnalyzer,
+    "locks": LockAnalyzer,
+    "io": IOAnalyzer,
+    "mem": MemAnalyzer,
+    "sample": SampleAnalyzer,
+    "lines": LineProfiler,
+    "complexity": ComplexityAnalyzer,
+}
+
+
+def merge_main(argv):
+    """
+    Cerbex merge: union learn stores from many shards into one store.
+    """
+    parser = argparse.ArgumentParser(
+        prog="Cerbex merge",
+        description="Union learn-mode stores (see --store) from many runs into one"
+    )
+    parser.add_argument(
+        "-o", "--output",
+        default="learn.db",
+        help="Store to merge into (created if missing)"
+    )
+    parser.add_argument(
+        "--reports",
+        action="store_true",
+        help="Also write dependencies.json, events.json and allowlist.json from the merged store"
+    )
+    parser.add_argument(
+        "stores",
+        nargs="+",
+        help="Shard stores to merge"
+    )
+    args = parser.parse_args(argv)
+
+    shards = [path for path in args.stores if Path(path).resolve() != Path(args.output).resolve()]
+    # Check every shard before touching the output, so a typo does not leave a partial merge
+    for path in shards:
+        if not is_learn_store(path):
+            parser.error(f"{path} is not a Cerbex learn store (missing, or not created with --store)")
+
+    store = LearnStore(args.output)
+    try:
+        for path in shards:
+            store.merge(path)
+        if args.reports:
+            dump_reports(store.dependencies(), store.events())
+    finally:
+        store.close()
+    print(f"Merged {len(shards)} store(s) into {args.output}")
+
+
+def report_main(argv):
+    """
+    Cerbex report: per-function latency summary of a perf log (text, .bin or .cbx).
+    """
+    # NumPy is optional; only this subcommand needs it
+    from Cerbex.report import SORT_KEYS, format_table, parse_time, sort_rows, summarize
+
+    parser = argparse.ArgumentParser(
+        prog="Cerbex report",
+        description="Summarize a perf log: count, total, mean, p50/p95/p99 and max per function"
+    )
+    parser.add_argument(
+        "log",
+        help="perf.log (log mode), perf.bin (samples mode) or perf.cbx (columnar mode)"
+    )
+    parser.add_argument(
+        "-m", "--module",
+        action="append",
+        default=[],
+        metavar="GLOB",
+        help="Only functions whose module.func matches GLOB, e.g. 'PIL.*' (repeatable)"
+    )
+    parser.add_argument(
+        "-n", "--top",
+        type=int,
+        default=0,
+        help="Show only the first N functions after sorting"
+    )
+    parser.add_argument(
+        "-s", "--sort",
+        choices=SORT_KEYS,
+        default="total",
+        help="Sort key (descending, except name)"
+    )
+    parser.add_argument(
+        "--since",
+        default=None,
+        help="Only calls starting at or after this time (epoch seconds or ISO 8601; .cbx logs only)"
+    )
+    parser.add_argument(
+        "--until",
+        default=None,
+        help="Only calls starting at or before this time (epoch seconds or ISO 8601; .cbx logs only)"
+    )
+    parser.add_argument(
+        "--json",
+        action="store_true",
+        help="Print JSON instead of a table"
+    )
+    args = parser.parse_args(argv)
+
+    try:
+        rows = summarize(
+            args.log,
+            patterns=args.module,
+            since=parse_time(args.since) if args.since else None,
+            until=parse_time(args.until) if args.until else None,
+        )
+    except (ImportError, ValueError, OSError) as e:
+        parser.exit(1, f"Cerbex report: {e}\n")
+    rows = sort_rows(rows, args.sort, args.top)
+    if args.json:
+        print(json.dumps(rows, indent=2))
+    else:
+        print(format_table(rows))
+
+
+SUBCOMMANDS = {
+    "merge": merge_main,
+    "report": report_main,
 }
 
 
 def main():
+    if len(sys.argv) > 1 and sys.argv[1] in SUBCOMMANDS:
+        return SUBCOMMANDS[sys.argv[1]](sys.argv[2:])
+
     parser = argparse.ArgumentParser(
         description="Learn or enforce module dependencies and hook enforcement"
     )
@@ -40,7 +175,7 @@ def main():
         nargs="*",
         choices=ANALYSIS_MAP.keys(),
         default=[],
-        help="Analyses to run (only in learn mode): perf, types"
+        help="Analyses to run (only in learn mode): perf, types, dataflow, timeline, spans, gc, locks, io, mem, sample, lines, complexity"
     )
     parser.add_argument(
         "-o", "--outdir",
@@ -63,6 +198,89 @@ def main():
     )
     parser.add_argument("--no-log", action="store_true",
                     help="Disable in-memory event recording (imports/calls/returns)")
+    parser.add_argument(
+        "--store",
+        default=None,
+        help="SQLite learn store to update incrementally with this run's edges and events (learn mode)"
+    )
+    parser.add_argument(
+        "--converge",
+        type=int,
+        default=0,
+        metavar="N",
+        help="Learn mode: unwrap each function after N recorded calls (analyses stop seeing it)"
+    )
+    parser.add_argument(
+        "--hot-rate",
+        type=float,
+        default=0.0,
+        metavar="CALLS_PER_S",
+        help="Learn mode: unwrap functions called at least this often that are also cheap (0 disables)"
+    )
+    parser.add_argument(
+        "--hot-mean-us",
+        type=float,
+        default=5.0,
+        help="Mean duration (microseconds) at or below which a hot function counts as cheap"
+    )
+    parser.add_argument(
+        "--hot-window",
+        type=int,
+        default=1000,
+        help="Calls per measurement window for the hot-and-cheap check"
+    )
+    parser.add_argument(
+        "--budget",
+        type=float,
+        default=0.0,
+        metavar="FRACTION",
+        help="Overhead budget, e.g. 0.02: sample calls per function so analyses use at most this share of wall time"
+    )
+    parser.add_argument(
+        "--no-wrap",
+        action="store_true",
+        help="Learn mode: do not wrap target functions or profile C calls (use with --analyses sample)"
+    )
+    parser.add_argument(
+        "--snapshot-signal",
+        action="store_true",
+        help="Learn mode: on SIGUSR1, write timestamped copies of analysis logs and JSON reports without stopping"
+    )
+    parser.add_argument(
+        "--snapshot-file",
+        default=None,
+        metavar="PATH",
+        help="Learn mode: take a snapshot whenever PATH is created (it is deleted once seen)"
+    )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Learn mode: write per-call perf (log mode), types and spans records from a background thread "
+             "to rotating files instead of buffering them until exit"
+    )
+    parser.add_argument(
+        "--stream-max-mb",
+        type=float,
+        default=100.0,
+        help="Size at which a streamed log is rotated"
+    )
+    parser.add_argument(
+        "--stream-backups",
+        type=int,
+        default=5,
+        help="Rotated files to keep per streamed log"
+    )
+    parser.add_argument(
+        "--stream-compress",
+        action="store_true",
+        help="Gzip rotated files"
+    )
+    parser.add_argument(
+        "--stream-backpressure",
+        choices=POLICIES,
+        default="drop",
+        help="When the writer falls behind: drop (and count) new records, or block the recording thread"
+    )
 
     args = parser.parse_args()
     outdir = Path(args.outdir)
@@ -70,20 +288,39 @@ def main():
     if args.mode == "learn":
         # Prepare output directory for analysis logs
         outdir.mkdir(parents=True, exist_ok=True)
-        analyses = [ANALYSIS_MAP[name](outfile=str(outdir / f"{name}.log"))
+        # Extra constructor options per analysis come from config.json "analysis_options"
+        options = load_analysis_options(args.config)
+        analyses = [ANALYSIS_MAP[name](outfile=str(outdir / f"{name}.log"), **options.get(name, {}))
                     for name in args.analyses]
+        flusher = None
+        if args.stream:
+            flusher = LogFlusher(max_bytes=int(args.stream_max_mb * (1 << 20)), backups=args.stream_backups,
+                                 compress=args.stream_compress, backpressure=args.stream_backpressure)
         # Install hooks in learn mode; JSON reports are auto-written to cwd
         install_hooks(
             config_path=args.config,
             mode="learn",
             analyses=analyses,
-            log_events=not args.no_log
+            log_events=not args.no_log,
+            store_path=args.store,
+            converge_after=args.converge,
+            hot_rate=args.hot_rate,
+            hot_mean_ns=args.hot_mean_us * 1000,
+            hot_window=args.hot_window,
+            budget=args.budget,
+            wrap=not args.no_wrap,
+            snapshot_signal=args.snapshot_signal,
+            snapshot_file=args.snapshot_file,
+            flusher=flusher
         )
 
         # Execute the script under instrumentation
         sys.argv = [args.script] + (args.args or [])
         runpy.run_path(args.script, run_name="__main__")
-        print(f"Learn mode complete. Logs in {outdir}, JSON reports (events.json, dependencies.json, allowlist.json) in current directory.")
+        if args.no_wrap:
+            print(f"Learn mode complete. Logs in {outdir} (no wrapping, JSON reports not written).")
+        else:
+            print(f"Learn mode complete. Logs in {outdir}, JSON reports (events.json, dependencies.json, allowlist.json) in current directory.")
 
     else:
         # Enforce mode: use existing allowlist to block disallowed calls
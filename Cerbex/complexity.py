@@ -0,0 +1,127 @@
+# File: complexity.py
+"""
+Input-size extraction and growth-model fitting for empirical complexity.
+
+A size extractor maps an argument to an int size or None. The first argument
+(positional, then keyword) any extractor can size gives the call's size.
+Built-in extractors cover image-like objects (.size == (w, h)), array-like
+objects (.shape), bytes/str and anything with len(). Register more with
+register_size_extractor() or "module:function" names in analysis_options.
+
+Durations are bucketed by floor(log2(size)); per function, t = a + b*g(n) is
+fitted by weighted least squares for g in O(1), O(n), O(n log n), O(n^2),
+using each bucket's fastest call so GC pauses and warm-up do not skew the fit.
+"""
+import importlib
+import math
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+SizeExtractor = Callable[[Any], Optional[int]]
+
+
+def _image_size(obj: Any) -> Optional[int]:
+    size = getattr(obj, "size", None)
+    if isinstance(size, tuple) and len(size) == 2 and all(isinstance(d, int) for d in size):
+        return size[0] * size[1]
+    return None
+
+
+def _shape_size(obj: Any) -> Optional[int]:
+    shape = getattr(obj, "shape", None)
+    if isinstance(shape, tuple) and shape and all(isinstance(d, int) for d in shape):
+        return math.prod(shape)
+    return None
+
+
+def _byte_length(obj: Any) -> Optional[int]:
+    if isinstance(obj, (bytes, bytearray, str)):
+        return len(obj)
+    if isinstance(obj, memoryview):
+        return obj.nbytes
+    return None
+
+
+def _length(obj: Any) -> Optional[int]:
+    if isinstance(obj, type) or not hasattr(obj, "__len__"):
+        return None
+    try:
+        return len(obj)
+    except Exception:
+        return None
+
+
+SIZE_EXTRACTORS: List[SizeExtractor] = [_byte_length, _image_size, _shape_size, _length]
+
+
+def register_size_extractor(fn: SizeExtractor) -> None:
+    """Try `fn` before the built-in extractors."""
+    SIZE_EXTRACTORS.insert(0, fn)
+
+
+def load_extractor(path: str) -> SizeExtractor:
+    """Import a "module:function" extractor named in config.json."""
+    module, _, attr = path.partition(":")
+    return getattr(importlib.import_module(module), attr)
+
+
+def call_size(args: tuple, kwargs: dict, extractors: Sequence[SizeExtractor] = SIZE_EXTRACTORS) -> Optional[int]:
+    for value in (*args, *kwargs.values()):
+        for extract in extractors:
+            try:
+                size = extract(value)
+            except Exception:
+                size = None
+            if size is not None:
+                return size
+    return None
+
+
+MODELS: Dict[str, Callable[[float], float]] = {
+    "O(1)": lambda n: 0.0,
+    "O(n)": lambda n: n,
+    "O(n log n)": lambda n: n * math.log2(n) if n > 1 else 0.0,
+    "O(n^2)": lambda n: n * n,
+}
+
+
+def _weighted_fit(points: List[Tuple[float, float, float]], g: Callable[[float], float]) -> Tuple[float, float, float]:
+    """Fit t = a + b*g(n) to (n, t, weight) points; returns (a, b, weighted SSE)."""
+    sw = sum(w for _, _, w in points)
+    xs = [(g(n), t, w) for n, t, w in points]
+    mx = sum(x * w for x, _, w in xs) / sw
+    mt = sum(t * w for _, t, w in xs) / sw
+    sxx = sum(w * (x - mx) ** 2 for x, _, w in xs)
+    b = sum(w * (x - mx) * (t - mt) for x, t, w in xs) / sxx if sxx > 0 else 0.0
+    if b < 0:
+        b = 0.0  # a cost that shrinks with size is not a growth model
+    a = mt - b * mx
+    sse = sum(w * (t - a - b * x) ** 2 for x, t, w in xs)
+    return a, b, sse
+
+
+def fit_growth(points: List[Tuple[float, float, float]], tolerance: float = 0.1,
+               min_r2: float = 0.5, min_slope: float = 0.2) -> Dict[str, Any]:
+    """
+    Pick the growth model for (size, seconds, weight) bucket points.
+    A higher-order model must cut the remaining error by more than `tolerance`
+    to beat a lower-order one. Growth models explaining less than `min_r2` of
+    the variance, or a log-log slope (a model-free exponent estimate, also
+    returned) under `min_slope`, are treated as noise around O(1).
+    """
+    sw = sum(w for _, _, w in points)
+    mt = sum(t * w for _, t, w in points) / sw
+    total = sum(w * (t - mt) ** 2 for _, t, w in points) or 1e-30
+    fits = {}
+    best, best_sse = None, None
+    for name, g in MODELS.items():
+        a, b, sse = _weighted_fit(points, g)
+        fits[name] = (a, b, 1 - sse / total)
+        if name == "O(1)":
+            continue
+        if best is None or sse < best_sse * (1 - tolerance):
+            best, best_sse = name, sse
+    logs = [(math.log(n), math.log(t), w) for n, t, w in points if n > 0 and t > 0]
+    slope = _weighted_fit(logs, lambda x: x)[1] if len(logs) >= 2 else 0.0
+    if best is None or fits[best][2] < min_r2 or slope < min_slope:
+        best = "O(1)"
+    return {"model": best, "r2": fits[best][2], "slope": slope, "fits": fits}
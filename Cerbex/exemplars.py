@@ -0,0 +1,116 @@
+# File: exemplars.py
+"""
+Bounded per-function record of the slowest calls.
+
+SlowestCalls keeps, per thread and function, a min-heap of at most K entries
+keyed by duration, so the cheapest kept call is on top. A finished call is
+compared against that call first; only calls that make it into the heap pay
+for describing themselves (argument repr, caller, thread, timestamp).
+"""
+import heapq
+import reprlib
+import sys
+import threading
+import time
+from itertools import count
+from typing import Any, Dict, List, NamedTuple, Optional, Set
+
+_repr = reprlib.Repr()
+_repr.maxstring = 80
+_repr.maxother = 80
+_repr.maxlevel = 3
+for _attr in ("maxlist", "maxtuple", "maxdict", "maxset", "maxfrozenset", "maxdeque", "maxarray"):
+    setattr(_repr, _attr, 8)
+
+
+def safe_repr(value: Any) -> str:
+    """Truncated repr that never raises (reprlib also bounds containers and strings)."""
+    try:
+        return _repr.repr(value)
+    except Exception:
+        return f"<{type(value).__name__} repr failed>"
+
+
+def format_args(args: tuple, kwargs: dict) -> str:
+    parts = [safe_repr(a) for a in args]
+    parts.extend(f"{k}={safe_repr(v)}" for k, v in kwargs.items())
+    return ", ".join(parts)
+
+
+def caller_summary(codes: Set, skip: int = 1) -> str:
+    """
+    'file:line in function' of the code that called the innermost wrapped
+    function, found by walking up to the first wrapper frame (codes is
+    utils.wrapper_codes()).
+    """
+    frame = sys._getframe(skip + 1)
+    while frame is not None and frame.f_code not in codes:
+        frame = frame.f_back
+    caller = frame.f_back if frame is not None else None
+    if caller is None:
+        return "<unknown>"
+    code = caller.f_code
+    return f"{code.co_filename}:{caller.f_lineno} in {code.co_name}"
+
+
+class Exemplar(NamedTuple):
+    duration_ns: int
+    timestamp: float
+    thread: str
+    caller: str
+    args: str
+
+
+class SlowestCalls:
+    """
+    Top-K slowest calls per function; one {name: heap} per thread, merged on read.
+    """
+    def __init__(self, k: int, wrapper_codes: Set) -> None:
+        self.k = k
+        self.codes = wrapper_codes
+        self._local = threading.local()
+        self._per_thread: List[Dict[str, list]] = []
+        self._lock = threading.Lock()
+        self._seq = count()
+
+    def offer(self, name: str, duration_ns: int, args: tuple, kwargs: dict) -> None:
+        """
+        Keep the call if it is among the K slowest seen by this thread.
+        Must be called from the on_return hook of the call being offered.
+        """
+        heaps = getattr(self._local, "heaps", None)
+        if heaps is None:
+            heaps = self._local.heaps = {}
+            with self._lock:
+                self._per_thread.append(heaps)
+        heap = heaps.get(name)
+        if heap is None:
+            heap = heaps[name] = []
+        if len(heap) >= self.k and duration_ns <= heap[0][0]:
+            return
+        exemplar = Exemplar(
+            duration_ns,
+            time.time(),
+            threading.current_thread().name,
+            caller_summary(self.codes, skip=2),
+            format_args(args, kwargs),
+        )
+        # The sequence number breaks duration ties so exemplars are never compared
+        entry = (duration_ns, next(self._seq), exemplar)
+        if len(heap) < self.k:
+            heapq.heappush(heap, entry)
+        else:
+            heapq.heapreplace(heap, entry)
+
+    def slowest(self, name: Optional[str] = None) -> Dict[str, List[Exemplar]]:
+        """
+        Returns name -> its K slowest calls across threads, slowest first.
+        """
+        with self._lock:
+            per_thread = list(self._per_thread)
+        merged: Dict[str, list] = {}
+        for heaps in per_thread:
+            for fn, heap in list(heaps.items()):
+                if name is None or fn == name:
+                    merged.setdefault(fn, []).extend(list(heap))
+        return {fn: [e for _, _, e in heapq.nlargest(self.k, entries)] for fn, entries in merged.items()}
@@ -0,0 +1,215 @@
+# File: flusher.py
+"""
+Background log writer shared by all analyses, for processes that run for weeks.
+
+Each log is a LogStream. Instrumented threads append raw records to their own
+buffer (a plain list append, no lock, no I/O, no formatting). One LogFlusher
+thread wakes every `interval` seconds, swaps every thread's buffer for an
+empty one (double buffering), and formats and writes the swapped-out batch one
+cycle later, so a record appended just as its buffer was swapped is never
+missed. Writes go to a RotatingFile: when the file reaches `max_bytes` it is
+renamed to path.1 (older ones shift to path.2 ... path.<backups>), optionally
+gzip-compressed to path.1.gz, and a new file is started.
+
+A thread buffer holds at most `max_pending` records. When the disk cannot keep
+up, further records are dropped and counted ("drop", the default) or the
+appending thread waits for the next swap ("block").
+"""
+import atexit
+import gzip
+import logging
+import os
+import shutil
+import threading
+import time
+from typing import Any, Callable, List
+
+logger = logging.getLogger(__name__)
+
+POLICIES = ("drop", "block")
+
+
+class RotatingFile:
+    """
+    Append-only text file capped at about max_bytes (measured in characters),
+    keeping `backups` rotated copies.
+    """
+    def __init__(self, path: str, max_bytes: int, backups: int = 5, compress: bool = False) -> None:
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.compress = compress
+        self._f = None
+        self._size = 0
+
+    def _open(self) -> None:
+        self._f = open(self.path, "a")
+        self._size = self._f.tell()
+
+    def _backup(self, i: int) -> str:
+        return f"{self.path}.{i}" + (".gz" if self.compress else "")
+
+    def rotate(self) -> None:
+        if self._f is not None:
+            self._f.close()
+            self._f = None
+        if self.backups <= 0:
+            os.remove(self.path)
+            return
+        for i in range(self.backups - 1, 0, -1):
+            if os.path.exists(self._backup(i)):
+                os.replace(self._backup(i), self._backup(i + 1))
+        if not self.compress:
+            os.replace(self.path, self._backup(1))
+            return
+        with open(self.path, "rb") as src, gzip.open(self._backup(1), "wb") as dst:
+            shutil.copyfileobj(src, dst)
+        os.remove(self.path)
+
+    def writelines(self, lines: List[str]) -> None:
+        if self._f is None:
+            self._open()
+        chunk: List[str] = []
+        for line in lines:
+            if self.max_bytes and self._size and self._size + len(line) > self.max_bytes:
+                self._f.writelines(chunk)
+                chunk = []
+                self.rotate()
+                self._open()
+            chunk.append(line)
+            self._size += len(line)
+        self._f.writelines(chunk)
+        self._f.flush()
+
+    def close(self) -> None:
+        if self._f is not None:
+            self._f.close()
+            self._f = None
+
+
+class LogStream:
+    """
+    One streamed log: per-thread record buffers drained into a RotatingFile.
+    `fmt` turns a record into a line and runs on the flusher thread.
+    """
+    def __init__(self, flusher: "LogFlusher", path: str, fmt: Callable[[Any], str]) -> None:
+        self.flusher = flusher
+        self.path = path
+        self.fmt = fmt
+        self.file = RotatingFile(path, flusher.max_bytes, flusher.backups, flusher.compress)
+        self._local = threading.local()
+        # One [buffer, dropped] box per thread
+        self._boxes: List[list] = []
+        self._lock = threading.Lock()
+        self._io_lock = threading.Lock()
+        # Batches swapped out last cycle, written this cycle
+        self._retired: List[list] = []
+
+    def write(self, record: Any) -> None:
+        box = getattr(self._local, "box", None)
+        if box is None:
+            box = self._local.box = [[], 0]
+            with self._lock:
+                self._boxes.append(box)
+        buf = box[0]
+        if len(buf) >= self.flusher.max_pending:
+            if not self.flusher.block:
+                box[1] += 1
+                return
+            self.flusher.wake()
+            while len(box[0]) >= self.flusher.max_pending and self.flusher.running:
+                time.sleep(0.001)
+            buf = box[0]
+        buf.append(record)
+
+    @property
+    def dropped(self) -> int:
+        with self._lock:
+            return sum(box[1] for box in self._boxes)
+
+    def drain(self, final: bool = False) -> None:
+        """
+        Swap out every thread's buffer and write the previous cycle's batches
+        (and, if `final`, this cycle's too).
+        """
+        with self._lock:
+            boxes = list(self._boxes)
+        with self._io_lock:
+            swapped = []
+            for box in boxes:
+                if box[0]:
+                    swapped.append(box[0])
+                    box[0] = []
+            batches = self._retired + swapped if final else self._retired
+            self._retired = [] if final else swapped
+            fmt = self.fmt
+            for batch in batches:
+                self.file.writelines([fmt(r) for r in batch])
+
+    def write_now(self, lines: List[str]) -> None:
+        """Drain everything, then append already formatted lines (at exit or from a snapshot)."""
+        self.drain(final=True)
+        with self._io_lock:
+            self.file.writelines(lines)
+
+    def close(self) -> None:
+        self.drain(final=True)
+        with self._io_lock:
+            self.file.close()
+
+
+class LogFlusher:
+    """
+    The shared flusher thread; create LogStreams with stream().
+    """
+    def __init__(self, max_bytes: int = 100 << 20, backups: int = 5, compress: bool = False,
+                 backpressure: str = "drop", max_pending: int = 100_000, interval: float = 0.5) -> None:
+        if backpressure not in POLICIES:
+            raise ValueError(f"Unknown backpressure policy {backpressure!r}, expected one of {POLICIES}")
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.compress = compress
+        self.block = backpressure == "block"
+        self.max_pending = max_pending
+        self.interval = interval
+        self.running = True
+        self._streams: List[LogStream] = []
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="cerbex-flusher", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def stream(self, path: str, fmt: Callable[[Any], str] = str) -> LogStream:
+        s = LogStream(self, path, fmt)
+        with self._lock:
+            self._streams.append(s)
+        return s
+
+    def wake(self) -> None:
+        self._wake.set()
+
+    def _run(self) -> None:
+        while self.running:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            with self._lock:
+                streams = list(self._streams)
+            for s in streams:
+                try:
+                    s.drain()
+                except Exception as e:
+                    logger.exception("flushing %s failed: %s", s.path, e)
+
+    def close(self) -> None:
+        """Stop the thread and write everything still buffered; safe to call twice."""
+        if not self.running:
+            return
+        self.running = False
+        self._wake.set()
+        with self._lock:
+            streams = list(self._streams)
+        for s in streams:
+            s.close()
+            if s.dropped:
+                logger.warning("%s: %d records dropped by backpressure", s.path, s.dropped)
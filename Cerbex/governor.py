@@ -0,0 +1,240 @@
+# File: governor.py
+"""
+Overhead budget governor: keeps the time spent in analysis callbacks below a
+fraction of wall time by sampling calls per function.
+
+The budget applies to the analysis callbacks, the only part sampling can cut.
+HookManager's whole call/return/raise dispatch (learn event recording and the
+sampling decision too, for every call) is measured separately with
+dispatched() and reported by dispatch_overhead(). Neither includes the
+wrapper's own frame or the C profile hook.
+
+Every function starts fully sampled. When the measured overhead exceeds the
+budget, the sampling rate each of the most expensive functions needs to cover
+the excess is computed from its cost, and it is switched to 1-in-N sampling
+or, past max_stride, to periodic bursts of consecutive calls. No function
+drops below 1 in max_period/burst calls; excess one function cannot absorb
+moves on to the next most expensive. While overhead stays under half the
+budget, rates are relaxed again, cheapest functions first.
+
+Everything is sampled until the first adjustment, so the first window is kept
+short (`warmup` s) and windows then double up to `interval`. overhead()
+reports the steady state after that first window.
+"""
+import math
+import threading
+from time import perf_counter_ns
+from typing import Dict, Tuple
+
+
+class _FnState:
+    __slots__ = ("burst", "period", "pos", "seen", "sampled", "cost_ns", "window_cost_ns")
+
+    def __init__(self) -> None:
+        # Admit the first `burst` calls of every `period` calls (1/1 = every call)
+        self.burst = 1
+        self.period = 1
+        self.pos = 0
+        self.seen = 0
+        self.sampled = 0
+        self.cost_ns = 0
+        self.window_cost_ns = 0
+
+
+class OverheadGovernor:
+    """
+    Per-function adaptive sampler driven by a wall-time overhead budget.
+    """
+    def __init__(
+        self,
+        budget: float = 0.02,
+        interval: float = 1.0,
+        max_stride: int = 1024,
+        burst: int = 16,
+        max_period: int = 1 << 18,
+        warmup: float = 0.05,
+    ) -> None:
+        self.budget = budget
+        self.interval = interval
+        self._wait = min(warmup, interval)
+        self.max_stride = max_stride
+        self.burst_len = burst
+        # Longest burst period: every function keeps at least burst/max_period of its calls
+        self.max_period = max(max_period, max_stride * burst)
+        self._fns: Dict[str, Dict[str, _FnState]] = {}
+        self._lock = threading.Lock()
+        self._started_ns = perf_counter_ns()
+        self._window_start_ns = self._started_ns
+        self._total_cost_ns = 0
+        # End and cost of the first (fully sampled) window, left out of overhead()
+        self._warmup_end_ns = 0
+        self._warmup_cost_ns = 0
+        # Whole-dispatch time (approximate under heavy threading; not lock-protected)
+        self._dispatch_ns = 0
+        self._warmup_dispatch_ns = 0
+        self.last_overhead = 0.0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="cerbex-governor", daemon=True)
+        self._thread.start()
+
+    def _state(self, module: str, func: str) -> _FnState:
+        funcs = self._fns.get(module)
+        if funcs is None:
+            with self._lock:
+                funcs = self._fns.setdefault(module, {})
+        st = funcs.get(func)
+        if st is None:
+            with self._lock:
+                st = funcs.setdefault(func, _FnState())
+        return st
+
+    def admit(self, module: str, func: str) -> bool:
+        """
+        Count a call and decide whether its analyses run. Counts are
+        approximate under heavy threading; they are not lock-protected.
+        """
+        st = self._state(module, func)
+        st.seen += 1
+        if st.period == 1:
+            st.sampled += 1
+            return True
+        pos = st.pos
+        st.pos = pos + 1 if pos + 1 < st.period else 0
+        if pos < st.burst:
+            st.sampled += 1
+            return True
+        return False
+
+    def charge(self, module: str, func: str, cost_ns: int) -> None:
+        """Record time spent in analysis callbacks for one admitted hook."""
+        st = self._state(module, func)
+        st.cost_ns += cost_ns
+        st.window_cost_ns += cost_ns
+
+    def dispatched(self, ns: int) -> None:
+        """Record the time of one whole hook dispatch, sampled out or not."""
+        self._dispatch_ns += ns
+
+    # -------------------------------
+    # Sampling policy
+    # -------------------------------
+    def _set_rate(self, st: _FnState, rate: float) -> None:
+        """Sample at most `rate` of the calls, in power-of-two steps, clamped to max_period."""
+        stride = 1 << max(math.ceil(math.log2(1 / max(rate, 1e-12))), 0)
+        if stride <= self.max_stride:
+            st.burst = 1
+            st.period = stride
+        else:
+            st.burst = self.burst_len
+            st.period = min(self.burst_len * stride, self.max_period)
+        st.pos = 0
+
+    def _relax(self, st: _FnState) -> None:
+        if st.burst > 1:
+            if st.period > self.max_stride * st.burst:
+                st.period //= 2
+            else:
+                st.burst = 1
+                st.period = self.max_stride
+        elif st.period > 1:
+            st.period //= 2
+        st.pos = 0
+
+    def adjust(self) -> float:
+        """
+        Re-balance sampling rates from the last window's cost.
+        Returns the overhead fraction observed in that window.
+        """
+        now = perf_counter_ns()
+        wall = max(now - self._window_start_ns, 1)
+        self._window_start_ns = now
+
+        states = [st for funcs in list(self._fns.values()) for st in list(funcs.values())]
+        costs = []
+        window_cost = 0
+        for st in states:
+            c, st.window_cost_ns = st.window_cost_ns, 0
+            window_cost += c
+            costs.append((c, st))
+        self._total_cost_ns += window_cost
+        frac = self.last_overhead = window_cost / wall
+        if not self._warmup_end_ns:
+            self._warmup_end_ns = now
+            self._warmup_cost_ns = window_cost
+            self._warmup_dispatch_ns = self._dispatch_ns
+
+        if frac > self.budget:
+            # Cut the most expensive functions to the rate that covers the excess;
+            # cost scales with the sampled fraction, and what one cannot cover moves on
+            excess = window_cost - self.budget * wall
+            floor = self.burst_len / self.max_period
+            for c, st in sorted(costs, key=lambda x: x[0], reverse=True):
+                if excess <= 0 or c == 0:
+                    break
+                rate = st.burst / st.period
+                if rate <= floor:
+                    continue
+                self._set_rate(st, rate * (1 - excess / c))
+                excess -= c * (1 - (st.burst / st.period) / rate)
+        elif frac < self.budget / 2:
+            # One relax step at most doubles a function's cost; cheapest first while it fits
+            headroom = self.budget / 2 * wall - window_cost
+            for c, st in sorted(costs, key=lambda x: x[0]):
+                if st.period > 1 and c <= headroom:
+                    self._relax(st)
+                    headroom -= c
+        return frac
+
+    def _run(self) -> None:
+        while not self._stop.wait(self._wait):
+            self.adjust()
+            self._wait = min(self._wait * 2, self.interval)
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    # -------------------------------
+    # Reporting
+    # -------------------------------
+    def overhead(self, warmup: bool = False) -> float:
+        """
+        Fraction of wall time spent in analysis callbacks since the first
+        window ended (steady state), or since start if `warmup` or before then.
+        """
+        pending = sum(st.window_cost_ns for funcs in list(self._fns.values())
+                      for st in list(funcs.values()))
+        cost = self._total_cost_ns + pending
+        start = self._started_ns
+        if self._warmup_end_ns and not warmup:
+            cost -= self._warmup_cost_ns
+            start = self._warmup_end_ns
+        return cost / max(perf_counter_ns() - start, 1)
+
+    def dispatch_overhead(self) -> float:
+        """Like overhead(), for the whole hook dispatch, steady state."""
+        cost, start = self._dispatch_ns, self._started_ns
+        if self._warmup_end_ns:
+            cost -= self._warmup_dispatch_ns
+            start = self._warmup_end_ns
+        return cost / max(perf_counter_ns() - start, 1)
+
+    def counts(self, name: str) -> Tuple[int, int]:
+        """Returns (calls seen, calls sampled) for "module.func"."""
+        module, _, func = name.rpartition(".")
+        st = self._fns.get(module, {}).get(func)
+        return (st.seen, st.sampled) if st else (0, 0)
+
+    @staticmethod
+    def extrapolate(seen: int, n: int, mean: float, var: float, z: float = 1.96) -> Tuple[float, float]:
+        """
+        Estimate the total over `seen` calls from n sampled durations with the
+        given mean and sample variance.
+        Returns (estimate, half-width of the ~95% confidence interval).
+        """
+        if n == 0:
+            return 0.0, 0.0
+        if n == 1 or seen <= n:
+            return mean * max(seen, n), 0.0
+        # Finite population correction: sampling without replacement from `seen` calls
+        fpc = math.sqrt((seen - n) / (seen - 1))
+        return mean * seen, z * seen * math.sqrt(var / n) * fpc
@@ -0,0 +1,115 @@
+# File: histogram.py
+"""
+Fixed-size, log-bucketed (HDR-style) latency histogram over integer nanoseconds.
+
+Each power of two is split into 2**SUB_BITS linear sub-buckets, so any recorded
+value is reported within ~1/2**SUB_BITS (about 6%) of its true value. Memory is
+constant no matter how many values are recorded.
+"""
+from array import array
+from typing import Dict, Iterator, Optional, Tuple
+
+SUB_BITS = 4
+SUB_COUNT = 1 << SUB_BITS
+# Largest tracked exponent: 2**44 ns is ~4.9 hours; larger values are clamped
+MAX_BITS = 44
+NUM_BUCKETS = (MAX_BITS - SUB_BITS + 1) * SUB_COUNT
+
+
+def bucket_index(value: int) -> int:
+    if value < SUB_COUNT:
+        return value if value > 0 else 0
+    shift = value.bit_length() - SUB_BITS - 1
+    idx = (shift + 1) * SUB_COUNT + (value >> shift) - SUB_COUNT
+    return idx if idx < NUM_BUCKETS else NUM_BUCKETS - 1
+
+
+def bucket_bounds(idx: int) -> Tuple[int, int]:
+    """Returns [low, high) of the values counted in bucket `idx`."""
+    if idx < SUB_COUNT:
+        return idx, idx + 1
+    shift = idx // SUB_COUNT - 1
+    mantissa = idx % SUB_COUNT + SUB_COUNT
+    return mantissa << shift, (mantissa + 1) << shift
+
+
+class LogHistogram:
+    """
+    Streaming histogram plus count, sum, sum of squares, min and max.
+    """
+    __slots__ = ("counts", "count", "total", "sumsq", "min", "max")
+
+    def __init__(self) -> None:
+        self.counts = array("Q", bytes(8 * NUM_BUCKETS))
+        self.count = 0
+        self.total = 0
+        self.sumsq = 0
+        self.min: Optional[int] = None
+        self.max = 0
+
+    def record(self, value: int) -> None:
+        self.counts[bucket_index(value)] += 1
+        self.count += 1
+        self.total += value
+        self.sumsq += value * value
+        if self.min is None or value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+
+    def merge(self, other: "LogHistogram") -> None:
+        counts = self.counts
+        for i, c in enumerate(other.counts):
+            if c:
+                counts[i] += c
+        self.count += other.count
+        self.total += other.total
+        self.sumsq += other.sumsq
+        if other.min is not None and (self.min is None or other.min < self.min):
+            self.min = other.min
+        if other.max > self.max:
+            self.max = other.max
+
+    def copy(self) -> "LogHistogram":
+        h = LogHistogram()
+        h.merge(self)
+        return h
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    @property
+    def variance(self) -> float:
+        if self.count < 2:
+            return 0.0
+        mean = self.total / self.count
+        return max(self.sumsq / self.count - mean * mean, 0.0) * self.count / (self.count - 1)
+
+    def percentile(self, q: float) -> float:
+        """
+        Value at quantile q (0..1), as the midpoint of its bucket clamped to [min, max].
+        """
+        if not self.count:
+            return 0.0
+        rank = max(1, int(q * self.count + 0.999999))
+        seen = 0
+        for idx, c in enumerate(self.counts):
+            if not c:
+                continue
+            seen += c
+            if seen >= rank:
+                low, high = bucket_bounds(idx)
+                mid = (low + high - 1) / 2
+                return float(min(max(mid, self.min), self.max))
+        return float(self.max)
+
+    def percentiles(self, qs=(0.5, 0.9, 0.99, 0.999)) -> Dict[float, float]:
+        return {q: self.percentile(q) for q in qs}
+
+    def buckets(self) -> Iterator[Tuple[int, int, int]]:
+        """Yields (low, high, count) for every non-empty bucket."""
+        for idx, c in enumerate(self.counts):
+            if c:
+                low, high = bucket_bounds(idx)
+                yield low, high, c
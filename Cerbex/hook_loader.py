@@ -4,11 +4,14 @@ Standalone hook loader for your project. Import this at startup to enable Lyapy
 """
 import sys
 import atexit
+import threading
 import json
-from typing import Dict, List, Tuple
+from typing import Dict, List, Optional, Tuple
 
 from Cerbex.hook_manager import HookManager, Analysis
+from Cerbex.governor import OverheadGovernor
 from Cerbex.importer import install_import_hook, rewrap_existing_targets, mark_loaded_c_exts
+from Cerbex.snapshot import SnapshotTrigger
 
 
 
@@ -24,6 +27,19 @@ def _load_config(path: str = 'config.json') -> Tuple[list, None]:
         return [], None
 
 
+def load_analysis_options(path: str = 'config.json') -> Dict[str, dict]:
+    """
+    Load per-analysis constructor options, e.g.
+    {"analysis_options": {"perf": {"mode": "aggregate"}}}.
+    """
+    try:
+        with open(path, 'r') as f:
+            data = json.load(f)
+        return data.get('analysis_options', {})
+    except FileNotFoundError:
+        return {}
+
+
 def _load_allowlist(path: str = 'allowlist.json') -> Dict[str, list]:
     """
     Load generated allowlist for enforce mode.
@@ -42,7 +58,17 @@ def install_hooks(
     mode: str       = 'learn',
     analyses        = None,
     allowlist_path: str = 'allowlist.json',
-    log_events=True
+    log_events=True,
+    store_path: Optional[str] = None,
+    converge_after: int = 0,
+    hot_rate: float = 0.0,
+    hot_mean_ns: float = 5000,
+    hot_window: int = 1000,
+    budget: float = 0.0,
+    wrap: bool = True,
+    snapshot_signal: bool = False,
+    snapshot_file: Optional[str] = None,
+    flusher=None
 ) -> HookManager:
     # 1) load config & allowlist
     targets, _   = _load_config(config_path)
@@ -52,9 +78,25 @@ def install_hooks(
         analyses = []
 
 
+    # Optional overhead governor: sample calls to stay within `budget` of wall time
+    governor = OverheadGovernor(budget=budget) if budget > 0 else None
+
     # 2) always create a HookManager
-    hook_mgr = HookManager(targets, analyses, mode=mode, allowlist=raw_allowlist,log_events=log_events)
+    hook_mgr = HookManager(targets, analyses, mode=mode, allowlist=raw_allowlist,log_events=log_events,
+                           store_path=store_path, converge_after=converge_after,
+                           hot_rate=hot_rate, hot_mean_ns=hot_mean_ns, hot_window=hot_window,
+                           governor=governor, flusher=flusher)
+
+
+    # On-demand snapshots (SIGUSR1 and/or a control file) while the target runs
+    if snapshot_signal or snapshot_file:
+        hook_mgr.snapshots = SnapshotTrigger(hook_mgr, use_signal=snapshot_signal,
+                                             control_file=snapshot_file, reports=wrap)
 
+    # Without wrapping (e.g. for the sampling analysis alone) nothing is recorded,
+    # so the learn reports are left untouched as well
+    if not wrap:
+        return hook_mgr
 
     # 4) install hooks
     install_import_hook(hook_mgr, targets)
@@ -62,10 +104,16 @@ def install_hooks(
     mark_loaded_c_exts(hook_mgr)
     rewrap_existing_targets(hook_mgr, targets)
     sys.setprofile(hook_mgr.c_profile)
+    # Threads started from now on report their C-extension calls too, but only
+    # for analyses that need them (the profiler costs on every call)
+    if mode == 'learn' and any(getattr(a, 'thread_c_calls', False) for a in analyses):
+        threading.setprofile(hook_mgr.c_profile)
 
     # 5) register the exit handler
   
     atexit.register(hook_mgr.write_reports)
+    # Registered last so it runs first: the exit-time writes are Cerbex's, not the target's
+    atexit.register(hook_mgr.begin_exit)
 
     return hook_mgr
 
@@ -1,9 +1,13 @@
 # File: hook_manager.py
+import sys
 import json
 import threading
 import builtins
 from typing import Any, Dict, List, Optional, Set
 from functools import wraps
+from contextvars import ContextVar
+from time import perf_counter_ns
+from Cerbex.learn_store import LearnStore
 import logging
 logger = logging.getLogger(__name__)
 
@@ -29,9 +33,14 @@ class Analysis:
     """
     Base hook interface: override any of these methods.
     """
+    def on_install(self, hook_mgr: "HookManager") -> None: ...
     def on_import(self, parent: Optional[str], name: str) -> None: ...
     def on_call(self, module: str, func: str, args: tuple, kwargs: dict) -> None: ...
     def on_return(self, module: str, func: str, result: Any) -> None: ...
+    def on_raise(self, module: str, func: str, exc: Optional[BaseException]) -> None: ...
+    def on_unwrap(self, module: str, func: str, stats: Dict[str, float]) -> None: ...
+    def on_suspend(self, module: str, func: str) -> None: ...
+    def on_resume(self, module: str, func: str) -> None: ...
 
 class HookManager:
     def __init__(
@@ -41,6 +50,13 @@ class HookManager:
         mode: str = 'learn',
         log_events=True,
         allowlist: Optional[Dict[str, List[str]]] = None,
+        store_path: Optional[str] = None,
+        converge_after: int = 0,
+        hot_rate: float = 0.0,
+        hot_mean_ns: float = 5000,
+        hot_window: int = 1000,
+        governor=None,
+        flusher=None,
     ) -> None:
         self.analyses = analyses
         self.mode = mode
@@ -52,6 +68,55 @@ class HookManager:
         self._local = threading.local()
         # Track C extension modules we care about
         self.c_ext_modules: Set[str] = set()
+        # Optional persistent learn store (SQLite) updated at exit
+        self.store_path = store_path
+        self._store: Optional[LearnStore] = None
+        # Reports can be written from a snapshot thread while the program runs
+        self._reports_lock = threading.Lock()
+        # Learn-mode convergence: stop instrumenting a function after this many
+        # recorded returns (0 keeps every wrapper forever)
+        self.converge_after = converge_after
+        self._c_returns: Dict[tuple, int] = {}
+        self._c_converged: Set[tuple] = set()
+        # Consecutive tracked C calls that hit only converged functions; at
+        # converge_after the profile hook is removed (c_profile_retired)
+        self._c_idle = 0
+        self.c_profile_retired = False
+        # Hot-and-cheap unwrapping (learn mode): a sync function called at least
+        # hot_rate times/s with mean duration <= hot_mean_ns is swapped back out
+        self.hot_rate = hot_rate
+        self.hot_mean_ns = hot_mean_ns
+        self.hot_window = hot_window
+        self.unwrapped: Dict[str, Dict[str, float]] = {}
+        # Optional OverheadGovernor: calls it samples out skip analyses entirely
+        self.governor = governor
+        # Without a governor, time spent in call/return/raise callbacks is summed
+        # here instead, but only if an analysis reports it (e.g. PerfAnalyzer's
+        # metrics endpoint); approximate under heavy threading, not lock-protected
+        self._time_hooks = governor is None and any(getattr(a, 'needs_overhead', False) for a in analyses)
+        self._started_ns = perf_counter_ns()
+        self._hook_ns = 0
+        # Task-local linked stack of (admitted, parent): the sampling decision of
+        # each open call, so its return or exception agrees with it
+        self._admitted: ContextVar[Optional[tuple]] = ContextVar(f"cerbex_admitted_{id(self)}", default=None)
+        # Optional LogFlusher: analyses stream per-call records through it instead of buffering them
+        self.flusher = flusher
+        # Optional SnapshotTrigger, set by install_hooks when snapshots are enabled
+        self.snapshots = None
+        # Async wrappers only step coroutines through the suspend/resume hooks
+        # when some analysis overrides them
+        self.track_suspensions = any(
+            getattr(type(a), 'on_suspend', Analysis.on_suspend) is not Analysis.on_suspend
+            or getattr(type(a), 'on_resume', Analysis.on_resume) is not Analysis.on_resume
+            for a in analyses
+        )
+
+        self._safe_on_install()
+
+    @safe_hook
+    def _safe_on_install(self) -> None:
+        for a in self.analyses:
+            a.on_install(self)
 
     def _record_event(self, module: str, tag: str) -> None:
         mod = module or '__main__'
@@ -76,6 +141,10 @@ class HookManager:
             a.on_import(parent, name)
 
     def on_call(self, module: str, func: str, args: tuple, kwargs: dict) -> None:
+        gov = self.governor
+        if gov is not None:
+            # Whole-dispatch time is reported next to the analysis cost the budget applies to
+            t0 = perf_counter_ns()
         if self.mode == "learn" and self.log_events:
             self._record_event(module, f"call:{func}")
         elif self.mode == 'enforce':
@@ -84,8 +153,20 @@ class HookManager:
                 # enforcement must escape
                 raise RuntimeError(f"[SECURITY] Blocked unauthorized call: {module}.{func}()")
 
-        # safe analysis callbacks
-        self._safe_on_call(module, func, args, kwargs)
+        if gov is None:
+            # safe analysis callbacks
+            if self._time_hooks:
+                t0 = perf_counter_ns()
+                self._safe_on_call(module, func, args, kwargs)
+                self._hook_ns += perf_counter_ns() - t0
+            else:
+                self._safe_on_call(module, func, args, kwargs)
+            return
+
+        # Remember the sampling decision so the matching return agrees with it
+        admitted = gov.admit(module, func)
+        self._admitted.set((admitted, self._admitted.get()))
+        self._charge(gov, module, func, t0, admitted, self._safe_on_call, args, kwargs)
 
     @safe_hook
     def _safe_on_call(self, module: str, func: str, args: tuple, kwargs: dict) -> None:
@@ -97,17 +178,136 @@ class HookManager:
     # Return hook + safe wrapper
     # -------------------------------
     def on_return(self, module: str, func: str, result: Any) -> None:
+        gov = self.governor
+        if gov is not None:
+            t0 = perf_counter_ns()
         if self.mode == "learn" and self.log_events:
             self._record_event(module, f"return:{func}")
 
-        # safe analysis callbacks
-        self._safe_on_return(module, func, result)
+        if gov is None:
+            # safe analysis callbacks
+            if self._time_hooks:
+                t0 = perf_counter_ns()
+                self._safe_on_return(module, func, result)
+                self._hook_ns += perf_counter_ns() - t0
+            else:
+                self._safe_on_return(module, func, result)
+            return
+
+        self._charge(gov, module, func, t0, self._pop_admitted(), self._safe_on_return, result)
 
     @safe_hook
     def _safe_on_return(self, module: str, func: str, result: Any) -> None:
         for a in self.analyses:
             a.on_return(module, func, result)
 
+    def overhead(self) -> Optional[float]:
+        """
+        Fraction of wall time since start spent in analysis callbacks, or the
+        governor's steady-state figure (after its first window) when one runs.
+        None when neither a governor nor an analysis asked for it.
+        """
+        if self.governor is not None:
+            return self.governor.overhead()
+        if not self._time_hooks:
+            return None
+        return self._hook_ns / max(perf_counter_ns() - self._started_ns, 1)
+
+    @staticmethod
+    def _charge(gov, module: str, func: str, t0: int, admitted: bool, dispatch, *args) -> None:
+        """Run the analyses if `admitted`, charging them and the whole dispatch since t0."""
+        if admitted:
+            t1 = perf_counter_ns()
+            dispatch(module, func, *args)
+            now = perf_counter_ns()
+            gov.charge(module, func, now - t1)
+        else:
+            now = perf_counter_ns()
+        gov.dispatched(now - t0)
+
+    def _pop_admitted(self) -> bool:
+        top = self._admitted.get()
+        if top is None:
+            return True
+        self._admitted.set(top[1])
+        return top[0]
+
+    # -------------------------------
+    # Exception hook + safe wrapper
+    # -------------------------------
+    def on_raise(self, module: str, func: str, exc: Optional[BaseException]) -> None:
+        """
+        A wrapped call ended with an exception instead of returning (`exc` is
+        None for C functions). Analyses that keep per-call stacks pop the
+        call's entry here.
+        """
+        gov = self.governor
+        if gov is None:
+            if self._time_hooks:
+                t0 = perf_counter_ns()
+                self._safe_on_raise(module, func, exc)
+                self._hook_ns += perf_counter_ns() - t0
+            else:
+                self._safe_on_raise(module, func, exc)
+            return
+
+        self._charge(gov, module, func, perf_counter_ns(), self._pop_admitted(), self._safe_on_raise, exc)
+
+    @safe_hook
+    def _safe_on_raise(self, module: str, func: str, exc: Optional[BaseException]) -> None:
+        for a in self.analyses:
+            a.on_raise(module, func, exc)
+
+    def on_unwrap(self, module: str, func: str, stats: Dict[str, float]) -> None:
+        """
+        Called once when a hot, cheap wrapper removes itself. `stats` holds the
+        observed calls/total_ns, and the rate/mean_ns measured over the last
+        window_ns before unwrapping.
+        """
+        self.unwrapped[f"{module}.{func}"] = stats
+        self._safe_on_unwrap(module, func, stats)
+
+    @safe_hook
+    def _safe_on_unwrap(self, module: str, func: str, stats: Dict[str, float]) -> None:
+        for a in self.analyses:
+            a.on_unwrap(module, func, stats)
+
+    # -------------------------------
+    # Coroutine suspend/resume hooks
+    # -------------------------------
+    def on_suspend(self, module: str, func: str) -> None:
+        """
+        A wrapped coroutine yielded to the event loop. Nested wrapped coroutines
+        each report the same suspension, innermost first.
+        """
+        if getattr(self._local, 'in_hook', False):
+            return
+        self._local.in_hook = True
+        try:
+            self._safe_on_suspend(module, func)
+        finally:
+            self._local.in_hook = False
+
+    @safe_hook
+    def _safe_on_suspend(self, module: str, func: str) -> None:
+        for a in self.analyses:
+            a.on_suspend(module, func)
+
+    def on_resume(self, module: str, func: str) -> None:
+        """A wrapped coroutine is running again (outermost first)."""
+        if getattr(self._local, 'in_hook', False):
+            return
+        self._local.in_hook = True
+        try:
+            self._safe_on_resume(module, func)
+        finally:
+            self._local.in_hook = False
+
+    @safe_hook
+    def _safe_on_resume(self, module: str, func: str) -> None:
+        for a in self.analyses:
+            a.on_resume(module, func)
+
     # This is a sys.setprofile() callback function that monitors C function calls
     def c_profile(self, frame, event, arg):
         """
@@ -123,7 +323,9 @@ class HookManager:
             return  # Exit early to prevent infinite loops
         
         # STEP 2: Filter for C function events only
-        if event not in ("c_call", "c_return"):
+        if event not in ("c_call", "c_return", "c_exception"):
+            if self.c_profile_retired:
+                sys.setprofile(None)  # Other threads drop the hook at their next event
             return  # Only care about C function calls/returns, ignore Python calls
         
         # STEP 3: Get the C function being called
@@ -138,6 +340,15 @@ class HookManager:
         
         # STEP 6: Get function name
         name = getattr(fn, '__name__', '<c_func>')  # Function name or default
+        if self._c_converged and (mod, name) in self._c_converged:
+            # Converged in learn mode, no longer tracked; once nothing new turns
+            # up for converge_after calls, stop paying for the profile hook at all
+            if event == 'c_call':
+                self._c_idle += 1
+                if self._c_idle >= self.converge_after:
+                    self._retire_c_profile()
+            return
+        self._c_idle = 0
         
         # STEP 7: Set reentrancy guard
         self._local.in_hook = True  # Mark that we're inside the hook
@@ -147,16 +358,43 @@ class HookManager:
             if event == 'c_call':
                 # C function is being called
                 self.on_call(mod, name, (), {})  # Log the call (no args/kwargs available)
+            elif event == 'c_exception':
+                # C function raised; the profiler does not pass the exception
+                self.on_raise(mod, name, None)
             else:  # event == 'c_return'
                 # C function is returning
                 # Note: Python's profiler can't see C function return values
                 self.on_return(mod, name, None)  # Log return with None value
+                if self.converge_after and self.mode == 'learn':
+                    self._count_c_return(mod, name)
         finally:
             # STEP 9: Always clear the reentrancy guard
             self._local.in_hook = False
 
 
 
+    def _retire_c_profile(self) -> None:
+        self.c_profile_retired = True
+        threading.setprofile(None)
+        sys.setprofile(None)
+
+    def _count_c_return(self, mod: str, name: str) -> None:
+        key = (mod, name)
+        count = self._c_returns.get(key, 0) + 1
+        if count >= self.converge_after:
+            self._c_returns.pop(key, None)
+            self._c_converged.add(key)
+        else:
+            self._c_returns[key] = count
+
+    def begin_exit(self) -> None:
+        """
+        First exit handler (install_hooks registers it last): everything Cerbex
+        writes at exit on this thread runs with hooks off, so reports and logs
+        are not recorded as the target's calls or I/O.
+        """
+        self._local.in_hook = True
+
     def record_allowlist(self) -> Dict[str, List[str]]:
         return {m: sorted(list(deps)) for m, deps in self.dep_graph.items()}
 
@@ -165,38 +403,44 @@ class HookManager:
         if self.mode == 'enforce':
             return
 
-        deps = self.record_allowlist()
-        with open(deps_path, 'w') as f:
-            json.dump({'dependencies': deps}, f, indent=2)
-
-        # events already in memory
-        events_out = {module: {event: True for event in tags} for module, tags in self.events.items()}
-        with open(events_path, 'w') as f:
-            json.dump(events_out, f, indent=2)
-
-        # build allowlist from dep_graph + events in memory
-        allow = {m: sorted(list(deps)) for m, deps in self.dep_graph.items()}
-        for module, tags in self.events.items():
-            calls = [tag.split(':', 1)[1] for tag in tags if tag.startswith('call:')]
-            if calls:
-                allow.setdefault(module, []).extend(calls)
-                allow[module] = sorted(set(allow[module]))
-
-        with open(allowlist_path, 'w') as f:
-            json.dump({'allowlist': allow}, f, indent=2)
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
+        # Copy first: other threads may still be adding edges and events
+        dep_graph = {m: set(d) for m, d in list(self.dep_graph.items())}
+        events = {m: set(tags) for m, tags in list(self.events.items())}
+        with self._reports_lock:
+            if self.store_path:
+                if self._store is None:
+                    self._store = LearnStore(self.store_path)
+                self._store.update(dep_graph, events)
+
+            dump_reports(dep_graph, events, deps_path, events_path, allowlist_path)
+
+
+def dump_reports(
+    dep_graph: Dict[str, Set[str]],
+    events: Dict[str, Set[str]],
+    deps_path='dependencies.json',
+    events_path='events.json',
+    allowlist_path='allowlist.json',
+) -> None:
+    """
+    Write dependencies.json, events.json and allowlist.json from a dep graph and event tags.
+    """
+    deps = {m: sorted(list(d)) for m, d in dep_graph.items()}
+    with open(deps_path, 'w') as f:
+        json.dump({'dependencies': deps}, f, indent=2)
+
+    # events already in memory
+    events_out = {module: {event: True for event in tags} for module, tags in events.items()}
+    with open(events_path, 'w') as f:
+        json.dump(events_out, f, indent=2)
+
+    # build allowlist from dep_graph + events in memory
+    allow = {m: sorted(list(d)) for m, d in dep_graph.items()}
+    for module, tags in events.items():
+        calls = [tag.split(':', 1)[1] for tag in tags if tag.startswith('call:')]
+        if calls:
+            allow.setdefault(module, []).extend(calls)
+            allow[module] = sorted(set(allow[module]))
+
+    with open(allowlist_path, 'w') as f:
+        json.dump({'allowlist': allow}, f, indent=2)
@@ -11,7 +11,7 @@ from typing import List, Any
 from weakref import WeakKeyDictionary
 
 from Cerbex.hook_manager import HookManager
-from Cerbex.utils import make_wrapper
+from Cerbex.utils import make_wrapper, register_site
 
 
 
@@ -20,17 +20,33 @@ _wrap_cache: "WeakKeyDictionary[FunctionType, FunctionType]" = WeakKeyDictionary
 # Primitives we don’t instrument
 PRIMITIVES = (str, int, float, bool, bytes, type(None))
 
+
+def matches_target(fullname: str, targets) -> bool:
+    """
+    True if module `fullname` is one of `targets`: an exact name, or a prefix
+    for targets ending in '*' (e.g. "request_example*").
+    """
+    return any(
+        fullname == t or (t.endswith('*') and fullname.startswith(t[:-1]))
+        for t in targets
+    )
+
+
 class LazyWrapper:
-    def __init__(self, name, orig_val, module_name, hook_mgr):
+    def __init__(self, name, orig_val, module_name, hook_mgr, cls=None):
         self.name = name
         self.orig_val = orig_val
         self.module_name = module_name
         self.hook_mgr = hook_mgr
+        # Class whose __dict__ holds this descriptor (for unwrapping)
+        self.cls = cls
         self._wrapped = None
 
     def __get__(self, instance, owner):
         if self._wrapped is None:
             self._wrapped = wrap_value(self.orig_val, self.module_name, self.hook_mgr)
+            if self.cls is not None and self._wrapped is not self.orig_val:
+                register_site(self._wrapped, self.cls, self.name, self.orig_val, installed=self)
         return self._wrapped if instance is None else self._wrapped.__get__(instance, owner)
 
 def should_wrap(attr_name: str, attr_val: Any) -> bool:
@@ -74,7 +90,7 @@ def wrap_value(val, module_name: str, hook_mgr: HookManager):
         if inspect.isclass(val) and val.__module__ == module_name:
             for attr_name, attr_val in list(val.__dict__.items()):
                 if should_wrap(attr_name, attr_val):  # filtering logic
-                    setattr(val, attr_name, LazyWrapper(attr_name, attr_val, module_name, hook_mgr))
+                    setattr(val, attr_name, LazyWrapper(attr_name, attr_val, module_name, hook_mgr, cls=val))
             return val
         # 2) Functions & bound methods
         if isinstance(val, (FunctionType, MethodType)) and val.__module__.startswith(module_name):
@@ -138,9 +154,10 @@ class InstrumentLoader(importlib.abc.Loader):
             if not attr_name.startswith('__'):
                 try:
                     # print(f"[WRAP_TIME] {attr_name} in {module.__name__}")
-                    module.__dict__[attr_name] = wrap_value(
-                        attr_val, module.__name__, self.hook_mgr
-                    )
+                    wrapped = wrap_value(attr_val, module.__name__, self.hook_mgr)
+                    module.__dict__[attr_name] = wrapped
+                    if wrapped is not attr_val:
+                        register_site(wrapped, module, attr_name, attr_val)
                 except Exception:
                     pass
 
@@ -151,12 +168,7 @@ class InstrumentFinder(importlib.abc.MetaPathFinder):
         self.targets = set(targets)
 
     def _matches(self, fullname: str) -> bool:
-        matches = any(
-            fullname == t or (t.endswith('*') and fullname.startswith(t[:-1]))
-            for t in self.targets
-        )
-        
-        return matches
+        return matches_target(fullname, self.targets)
     
 
     def find_spec(self, fullname, path, target=None):
@@ -218,11 +230,10 @@ def install_import_hook(
                     try:
                         raw = getattr(module, attr)
                         # print(f"[DEBUG import_module] Wrapping {module.__name__}.{attr}")
-                        setattr(
-                            module,
-                            attr,
-                            wrap_value(raw, module.__name__, hook_mgr)
-                        )
+                        wrapped = wrap_value(raw, module.__name__, hook_mgr)
+                        setattr(module, attr, wrapped)
+                        if wrapped is not raw:
+                            register_site(wrapped, module, attr, raw)
                     except Exception:
                         pass
             return module
@@ -243,6 +254,8 @@ def rewrap_existing_targets(hook_mgr: HookManager, targets: List[str]):
                     raw = getattr(mod, attr)
                     wrapped = wrap_value(raw, name, hook_mgr)
                     setattr(mod, attr, wrapped)
+                    if wrapped is not raw:
+                        register_site(wrapped, mod, attr, raw)
                 except Exception:
                     pass
 # Most robust version
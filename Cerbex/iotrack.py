@@ -0,0 +1,231 @@
+# File: iotrack.py
+"""
+I/O attribution hooks.
+
+- An audit hook (sys.addaudithook) counts file opens, directory listings, file
+  system changes, DNS lookups, socket connects/sendto and subprocess launches.
+- builtins.open returns a TrackedFile proxy while a wrapped call is running, so
+  reads and writes are timed and their sizes counted per file.
+- socket.socket (and ssl.SSLSocket) send/recv methods are timed per peer host.
+
+Everything is reported through a recorder callable (op, target, nbytes, ns);
+nothing is recorded when `active()` says no wrapped call is on the stack.
+Audit hooks cannot be removed, so uninstall() only disables them.
+"""
+import builtins
+import os
+import socket
+import sys
+from functools import wraps
+from time import perf_counter_ns
+from typing import Any, Callable, Dict, Optional
+from weakref import WeakKeyDictionary
+
+try:
+    import ssl
+except ImportError:  # Python built without OpenSSL
+    ssl = None
+
+_native_open = builtins.open
+
+Recorder = Callable[[str, str, int, int], None]
+
+_recorder: Optional[Recorder] = None
+_active: Callable[[], bool] = lambda: False
+_enabled = False
+_hooked = False
+
+# socket -> "host:port", learned from socket.connect audit events or getpeername()
+_peers: "WeakKeyDictionary[socket.socket, str]" = WeakKeyDictionary()
+
+
+def _fmt_path(path: Any) -> str:
+    if isinstance(path, int):
+        return f"fd:{path}"
+    try:
+        return os.fsdecode(path)
+    except TypeError:
+        return repr(path)
+
+
+def _fmt_addr(addr: Any) -> str:
+    if isinstance(addr, tuple) and len(addr) >= 2:
+        return f"{addr[0]}:{addr[1]}"
+    return _fmt_path(addr) if addr else "<unknown>"
+
+
+def _peer(sock) -> str:
+    peer = _peers.get(sock)
+    if peer is None:
+        try:
+            peer = _fmt_addr(sock.getpeername())
+        except (OSError, ValueError):
+            peer = "<unconnected socket>"
+        try:
+            _peers[sock] = peer
+        except TypeError:
+            pass
+    return peer
+
+
+# audit event -> (op name, function turning the event args into a target)
+AUDIT_EVENTS: Dict[str, tuple] = {
+    "open": ("open", lambda a: _fmt_path(a[0])),
+    "os.listdir": ("listdir", lambda a: _fmt_path(a[0])),
+    "os.scandir": ("scandir", lambda a: _fmt_path(a[0])),
+    "os.mkdir": ("mkdir", lambda a: _fmt_path(a[0])),
+    "os.remove": ("remove", lambda a: _fmt_path(a[0])),
+    "os.rmdir": ("rmdir", lambda a: _fmt_path(a[0])),
+    "os.rename": ("rename", lambda a: _fmt_path(a[0])),
+    "shutil.copyfile": ("copyfile", lambda a: _fmt_path(a[0])),
+    "shutil.rmtree": ("rmtree", lambda a: _fmt_path(a[0])),
+    "socket.getaddrinfo": ("getaddrinfo", lambda a: _fmt_addr(a[:2])),
+    "socket.connect": ("connect", lambda a: _fmt_addr(a[1])),
+    "socket.sendto": ("sendto", lambda a: _fmt_addr(a[1])),
+    "subprocess.Popen": ("popen", lambda a: _fmt_path(a[0])),
+}
+
+
+def _audit(event: str, args: tuple) -> None:
+    if not _enabled:
+        return
+    spec = AUDIT_EVENTS.get(event)
+    if spec is None:
+        return
+    try:
+        if event == "socket.connect":
+            _peers[args[0]] = _fmt_addr(args[1])
+        if _active():
+            op, target = spec
+            _recorder(op, target(args), 0, 0)
+    except Exception:
+        pass  # never break the audited operation
+
+
+class TrackedFile:
+    """
+    Proxy around a file object timing read/write calls; everything else is delegated.
+    Sizes are bytes in binary mode and characters in text mode.
+    """
+    __slots__ = ("_f", "_target")
+
+    def __init__(self, f, target: str) -> None:
+        self._f = f
+        self._target = target
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._f, name)
+
+    def _timed(self, op: str, method, args, size) -> Any:
+        t0 = perf_counter_ns()
+        result = method(*args)
+        ns = perf_counter_ns() - t0
+        _recorder(op, self._target, size(result, args), ns)
+        return result
+
+    def read(self, *args):
+        return self._timed("read", self._f.read, args, lambda r, a: len(r))
+
+    def readline(self, *args):
+        return self._timed("read", self._f.readline, args, lambda r, a: len(r))
+
+    def readlines(self, *args):
+        return self._timed("read", self._f.readlines, args, lambda r, a: sum(map(len, r)))
+
+    def readinto(self, *args):
+        return self._timed("read", self._f.readinto, args, lambda r, a: r or 0)
+
+    def write(self, *args):
+        return self._timed("write", self._f.write, args, lambda r, a: len(a[0]))
+
+    def writelines(self, *args):
+        lines = list(args[0])
+        return self._timed("write", self._f.writelines, (lines,), lambda r, a: sum(map(len, lines)))
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        line = self.readline()
+        if not line:
+            raise StopIteration
+        return line
+
+    def __enter__(self):
+        self._f.__enter__()
+        return self
+
+    def __exit__(self, *exc):
+        return self._f.__exit__(*exc)
+
+    def __repr__(self) -> str:
+        return f"<TrackedFile {self._f!r}>"
+
+
+@wraps(_native_open)
+def _open(file, *args, **kwargs):
+    f = _native_open(file, *args, **kwargs)
+    if _enabled and _active():
+        return TrackedFile(f, _fmt_path(file))
+    return f
+
+
+def _socket_method(cls, name: str, op: str, size: Callable[[Any, tuple], int]) -> None:
+    # socket.socket inherits these from the C base class; setting them shadows it
+    orig = getattr(cls, name, None)
+    if orig is None:
+        return
+
+    @wraps(orig)
+    def method(self, *args, **kwargs):
+        if not _enabled or not _active():
+            return orig(self, *args, **kwargs)
+        t0 = perf_counter_ns()
+        result = orig(self, *args, **kwargs)
+        ns = perf_counter_ns() - t0
+        _recorder(op, _peer(self), size(result, args), ns)
+        return result
+
+    setattr(cls, name, method)
+
+
+_SOCKET_METHODS = (
+    ("send", "send", lambda r, a: r),
+    ("sendall", "send", lambda r, a: len(a[0])),
+    ("sendto", "send", lambda r, a: r),
+    ("recv", "recv", lambda r, a: len(r)),
+    ("recv_into", "recv", lambda r, a: r),
+    ("recvfrom", "recv", lambda r, a: len(r[0])),
+    ("recvfrom_into", "recv", lambda r, a: r[0]),
+)
+# SSLSocket funnels recv/recv_into through read() and sendall() through send()
+_SSL_METHODS = (
+    ("send", "send", lambda r, a: r),
+    ("write", "send", lambda r, a: r),
+    ("read", "recv", lambda r, a: r if isinstance(r, int) else len(r)),
+)
+
+
+def install(recorder: Recorder, active: Callable[[], bool]) -> None:
+    """
+    Start attributing I/O to `recorder` whenever `active()` is true.
+    """
+    global _recorder, _active, _enabled, _hooked
+    _recorder = recorder
+    _active = active
+    if not _hooked:
+        _hooked = True
+        sys.addaudithook(_audit)
+        builtins.open = _open
+        for name, op, size in _SOCKET_METHODS:
+            _socket_method(socket.socket, name, op, size)
+        if ssl is not None:
+            for name, op, size in _SSL_METHODS:
+                _socket_method(ssl.SSLSocket, name, op, size)
+    _enabled = True
+
+
+def uninstall() -> None:
+    """Stop recording (the audit hook itself stays registered)."""
+    global _enabled
+    _enabled = False
@@ -0,0 +1,164 @@
+# File: learn_store.py
+"""
+Persistent learn-mode store backed by a local SQLite file.
+
+Every module, import and event tag is interned once in the ``names`` table;
+dependency edges and events are stored as pairs of those integer IDs. Each
+learn run only inserts the edges it has not persisted yet, and stores from
+many shards can be unioned without re-parsing any JSON.
+"""
+import os
+import sqlite3
+from pathlib import Path
+from typing import Dict, Iterable, Set, Tuple
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS names (
+    id   INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS deps (
+    parent INTEGER NOT NULL,
+    child  INTEGER NOT NULL,
+    PRIMARY KEY (parent, child)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS events (
+    module INTEGER NOT NULL,
+    tag    INTEGER NOT NULL,
+    PRIMARY KEY (module, tag)
+) WITHOUT ROWID;
+"""
+_TABLES = {"names", "deps", "events"}
+
+
+def is_learn_store(path: str) -> bool:
+    """
+    True if `path` is an existing SQLite file with the store's tables. Opens it
+    read-only, so a missing path is not created.
+    """
+    if not os.path.isfile(path):
+        return False
+    try:
+        conn = sqlite3.connect(f"{Path(path).resolve().as_uri()}?mode=ro", uri=True)
+        try:
+            tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        finally:
+            conn.close()
+    except sqlite3.DatabaseError:
+        return False
+    return _TABLES <= tables
+
+
+class LearnStore:
+    """
+    Incrementally updated, mergeable store of dependencies and events.
+    """
+    def __init__(self, path: str = "learn.db") -> None:
+        self.path = path
+        # Shards running side by side may share one store; wait for the lock.
+        # Snapshots update it from a background thread, serialized by HookManager
+        self._conn = sqlite3.connect(path, timeout=60, check_same_thread=False)
+        self._conn.executescript(_SCHEMA)
+        self._ids: Dict[str, int] = {}
+        # Pairs already written by this process, so repeated updates only add new rows
+        self._persisted_deps: Set[Tuple[str, str]] = set()
+        self._persisted_events: Set[Tuple[str, str]] = set()
+
+    def close(self) -> None:
+        self._conn.close()
+
+    def _intern(self, names: Iterable[str]) -> None:
+        missing = [(n,) for n in set(names) if n not in self._ids]
+        if not missing:
+            return
+        self._conn.executemany("INSERT OR IGNORE INTO names(name) VALUES (?)", missing)
+        for (name,) in missing:
+            row = self._conn.execute("SELECT id FROM names WHERE name = ?", (name,)).fetchone()
+            self._ids[name] = row[0]
+
+    def update(self, dep_graph: Dict[str, Set[str]], events: Dict[str, Set[str]]) -> int:
+        """
+        Persist edges and events not yet written by this process.
+        Returns the number of new (parent, child) / (module, tag) pairs offered.
+        """
+        new_deps = [(p, c) for p, children in list(dep_graph.items()) for c in list(children)
+                    if (p, c) not in self._persisted_deps]
+        new_events = [(m, t) for m, tags in list(events.items()) for t in list(tags)
+                      if (m, t) not in self._persisted_events]
+        if not new_deps and not new_events:
+            return 0
+
+        with self._conn:
+            self._intern([n for pair in new_deps for n in pair] +
+                         [n for pair in new_events for n in pair])
+            ids = self._ids
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO deps(parent, child) VALUES (?, ?)",
+                [(ids[p], ids[c]) for p, c in new_deps],
+            )
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO events(module, tag) VALUES (?, ?)",
+                [(ids[m], ids[t]) for m, t in new_events],
+            )
+        self._persisted_deps.update(new_deps)
+        self._persisted_events.update(new_events)
+        return len(new_deps) + len(new_events)
+
+    def merge(self, path: str) -> None:
+        """
+        Union another store into this one. Names are re-interned with a single
+        join per table; rows never pass through Python. Raises ValueError if
+        `path` is not a learn store (ATTACH would create an empty file).
+        """
+        if not is_learn_store(path):
+            raise ValueError(f"{path} is not a Cerbex learn store")
+        with self._conn:
+            self._conn.execute("ATTACH DATABASE ? AS src", (path,))
+        try:
+            with self._conn:
+                self._conn.execute(
+                    "INSERT OR IGNORE INTO names(name) SELECT name FROM src.names"
+                )
+                self._conn.execute(
+                    """
+                    INSERT OR IGNORE INTO deps(parent, child)
+                    SELECT p.id, c.id
+                    FROM src.deps d
+                    JOIN src.names sp ON sp.id = d.parent
+                    JOIN src.names sc ON sc.id = d.child
+                    JOIN names p ON p.name = sp.name
+                    JOIN names c ON c.name = sc.name
+                    """
+                )
+                self._conn.execute(
+                    """
+                    INSERT OR IGNORE INTO events(module, tag)
+                    SELECT m.id, t.id
+                    FROM src.events e
+                    JOIN src.names sm ON sm.id = e.module
+                    JOIN src.names st ON st.id = e.tag
+                    JOIN names m ON m.name = sm.name
+                    JOIN names t ON t.name = st.name
+                    """
+                )
+        finally:
+            self._conn.execute("DETACH DATABASE src")
+        self._ids.clear()
+
+    def dependencies(self) -> Dict[str, Set[str]]:
+        return self._pairs(
+            "SELECT p.name, c.name FROM deps d "
+            "JOIN names p ON p.id = d.parent JOIN names c ON c.id = d.child"
+        )
+
+    def events(self) -> Dict[str, Set[str]]:
+        return self._pairs(
+            "SELECT m.name, t.name FROM events e "
+            "JOIN names m ON m.id = e.module JOIN names t ON t.id = e.tag"
+        )
+
+    def _pairs(self, query: str) -> Dict[str, Set[str]]:
+        out: Dict[str, Set[str]] = {}
+        for key, value in self._conn.execute(query):
+            out.setdefault(key, set()).add(value)
+        return out
@@ -0,0 +1,181 @@
+# File: lineprof.py
+"""
+Per-line timing scoped to selected code objects.
+
+On Python 3.12+ MonitoringLines turns on sys.monitoring LINE/PY_* events for
+just those code objects, so nothing else in the process is slowed down. Older
+versions use TraceLines: a sys.settrace function is installed on the calling
+thread only for the duration of a selected call, and returns a line tracer only
+for selected code objects.
+
+A line's time runs from its LINE event to the next LINE (or return/yield) in
+the same frame, so it includes callees. Tracer bookkeeping is excluded.
+"""
+import sys
+import threading
+from time import perf_counter_ns
+from typing import Dict, List, Set
+
+
+class LineTimes:
+    """
+    code object -> {line: [hits, total ns]}, one dict per thread, merged on read.
+    """
+    def __init__(self) -> None:
+        self._local = threading.local()
+        self._per_thread: List[Dict] = []
+        self._lock = threading.Lock()
+
+    def record(self, code, line: int, ns: int) -> None:
+        stats = getattr(self._local, "stats", None)
+        if stats is None:
+            stats = self._local.stats = {}
+            with self._lock:
+                self._per_thread.append(stats)
+        lines = stats.get(code)
+        if lines is None:
+            lines = stats[code] = {}
+        entry = lines.get(line)
+        if entry is None:
+            entry = lines[line] = [0, 0]
+        entry[0] += 1
+        entry[1] += ns
+
+    def merged(self) -> Dict:
+        with self._lock:
+            per_thread = list(self._per_thread)
+        out: Dict = {}
+        for stats in per_thread:
+            for code, lines in list(stats.items()):
+                mine = out.setdefault(code, {})
+                for line, (hits, ns) in list(lines.items()):
+                    entry = mine.setdefault(line, [0, 0])
+                    entry[0] += hits
+                    entry[1] += ns
+        return out
+
+
+class _FrameTracer:
+    __slots__ = ("times", "line", "t")
+
+    def __init__(self, times: LineTimes) -> None:
+        self.times = times
+        self.line = 0
+        self.t = 0
+
+    def trace(self, frame, event, arg):
+        now = perf_counter_ns()
+        if self.line:
+            self.times.record(frame.f_code, self.line, now - self.t)
+        if event == "line":
+            self.line = frame.f_lineno
+        elif event == "return":
+            self.line = 0
+        self.t = perf_counter_ns()
+        return self.trace
+
+
+class TraceLines:
+    """
+    sys.settrace backend; enter()/exit() bracket every call of a selected function.
+    """
+    def __init__(self, times: LineTimes) -> None:
+        self.times = times
+        self.codes: Set = set()
+        self._local = threading.local()
+
+    def add(self, code) -> None:
+        self.codes.add(code)
+
+    def _global(self, frame, event, arg):
+        if frame.f_code in self.codes:
+            return _FrameTracer(self.times).trace
+        return None
+
+    def enter(self) -> None:
+        depth = getattr(self._local, "depth", 0)
+        if not depth:
+            self._local.prev = sys.gettrace()
+            sys.settrace(self._global)
+        self._local.depth = depth + 1
+
+    def exit(self) -> None:
+        depth = getattr(self._local, "depth", 0) - 1
+        if depth < 0:
+            return
+        self._local.depth = depth
+        if not depth:
+            sys.settrace(self._local.prev)
+            self._local.prev = None
+
+
+class MonitoringLines:
+    """
+    sys.monitoring backend (Python 3.12+); events are enabled per code object,
+    so enter()/exit() have nothing to do.
+    """
+    def __init__(self, times: LineTimes) -> None:
+        mon = sys.monitoring
+        self.times = times
+        self._local = threading.local()
+        for tool in (mon.PROFILER_ID, 3, 4):
+            if mon.get_tool(tool) is None:
+                mon.use_tool_id(tool, "cerbex-lines")
+                self.tool = tool
+                break
+        else:
+            raise RuntimeError("no free sys.monitoring tool ID for line profiling")
+        ev = mon.events
+        self.events = ev.LINE | ev.PY_START | ev.PY_RESUME | ev.PY_RETURN | ev.PY_YIELD
+        mon.register_callback(self.tool, ev.LINE, self._line)
+        mon.register_callback(self.tool, ev.PY_START, self._start)
+        mon.register_callback(self.tool, ev.PY_RESUME, self._start)
+        mon.register_callback(self.tool, ev.PY_RETURN, self._stop)
+        mon.register_callback(self.tool, ev.PY_YIELD, self._stop)
+
+    def add(self, code) -> None:
+        sys.monitoring.set_local_events(self.tool, code, self.events)
+
+    def enter(self) -> None: ...
+    def exit(self) -> None: ...
+
+    def _stack(self) -> list:
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def _start(self, code, offset) -> None:
+        # [code, current line, time the line started]
+        self._stack().append([code, 0, 0])
+
+    def _line(self, code, line) -> None:
+        now = perf_counter_ns()
+        stack = self._stack()
+        # Frames left by exceptions never saw PY_RETURN; drop them
+        while stack and stack[-1][0] is not code:
+            stack.pop()
+        if not stack:
+            stack.append([code, 0, 0])
+        top = stack[-1]
+        if top[1]:
+            self.times.record(code, top[1], now - top[2])
+        top[1] = line
+        top[2] = perf_counter_ns()
+
+    def _stop(self, code, offset, value) -> None:
+        now = perf_counter_ns()
+        stack = self._stack()
+        while stack and stack[-1][0] is not code:
+            stack.pop()
+        if stack:
+            _, line, start = stack.pop()
+            if line:
+                self.times.record(code, line, now - start)
+
+
+def line_backend(times: LineTimes):
+    """The best backend available on this Python."""
+    if hasattr(sys, "monitoring"):
+        return MonitoringLines(times)
+    return TraceLines(times)
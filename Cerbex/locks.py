@@ -0,0 +1,202 @@
+# File: locks.py
+"""
+Contention tracking for locks and queues, attributed to the wrapped call that
+acquires them.
+
+install() swaps threading.Lock/RLock/Condition for factories that hand out a
+TrackedLock proxy, and patches queue.Queue so get() is timed. Every lock and
+queue created after install() is tracked wherever it was created (the target,
+the standard library, third-party code), except Cerbex's own; its site is the
+first creating frame outside threading and queue. Acquires are only timed
+while `active()` says the acquiring thread is inside a wrapped call, so code
+outside the targets pays one check per acquire. Uncontended acquires take a
+non-blocking fast path; only acquires that actually wait are timed.
+"""
+import queue
+import sys
+import threading
+from time import perf_counter_ns
+from typing import Callable, Optional
+
+_native_lock = threading.Lock
+_native_rlock = threading.RLock
+_native_condition = threading.Condition
+_native_queue_init = queue.Queue.__init__
+_native_queue_get = queue.Queue.get
+
+# Receives (kind, site, wait ns, contended, hold ns); hold is -1 for acquire events
+Recorder = Callable[[str, str, int, bool, int], None]
+
+_recorder: Recorder = None
+# True while the calling thread is inside a wrapped call
+_active: Callable[[], bool] = None
+
+# Frames skipped when looking for the code that created a lock
+_PLUMBING = ("threading", "queue", __name__)
+
+
+def _caller_site(depth: int) -> Optional[str]:
+    """
+    'module:line' of the first frame `depth` or more levels up outside
+    threading/queue, or None for Cerbex's own locks (kept native).
+    """
+    frame = sys._getframe(depth + 1)
+    while frame is not None and frame.f_globals.get("__name__") in _PLUMBING:
+        frame = frame.f_back
+    if frame is None:
+        return "<unknown>"
+    name = frame.f_globals.get("__name__") or "?"
+    if name == "Cerbex" or name.startswith("Cerbex."):
+        return None
+    return f"{name}:{frame.f_lineno}"
+
+
+class TrackedLock:
+    """
+    Proxy around a native Lock or RLock recording wait and hold times.
+    """
+    __slots__ = ("_inner", "site", "kind", "_depth", "_acquired_at")
+
+    def __init__(self, inner, site: str, kind: str) -> None:
+        self._inner = inner
+        self.site = site
+        self.kind = kind
+        self._depth = 0
+        self._acquired_at = 0
+
+    def _timed_acquire(self, blocking: bool = True, timeout: float = -1) -> bool:
+        inner = self._inner
+        if inner.acquire(False):
+            wait, contended, ok = 0, False, True
+        elif not blocking:
+            wait, contended, ok = 0, True, False
+        else:
+            t0 = perf_counter_ns()
+            ok = inner.acquire(True, timeout)
+            wait, contended = perf_counter_ns() - t0, True
+        _recorder(self.kind, self.site, wait, contended, -1)
+        return ok
+
+    def acquire(self, blocking: bool = True, timeout: float = -1) -> bool:
+        timed = _active()
+        ok = self._timed_acquire(blocking, timeout) if timed else self._inner.acquire(blocking, timeout)
+        if ok:
+            self._depth += 1
+            if self._depth == 1:
+                # 0: acquired outside wrapped code, hold time not recorded
+                self._acquired_at = perf_counter_ns() if timed else 0
+        return ok
+
+    def release(self) -> None:
+        depth = self._depth
+        held_since = self._acquired_at
+        self._depth = depth - 1 if depth else 0
+        self._inner.release()
+        if depth == 1 and held_since:
+            _recorder(self.kind, self.site, 0, False, perf_counter_ns() - held_since)
+
+    __enter__ = acquire
+
+    def __exit__(self, *exc) -> None:
+        self.release()
+
+    def locked(self) -> bool:
+        return self._inner.locked()
+
+    # Condition support: fully release / restore a (possibly recursive) lock
+    def _is_owned(self) -> bool:
+        inner = self._inner
+        if hasattr(inner, "_is_owned"):
+            return inner._is_owned()
+        if inner.acquire(False):
+            inner.release()
+            return False
+        return True
+
+    def _release_save(self):
+        depth, held_since = self._depth, self._acquired_at
+        self._depth = 0
+        if hasattr(self._inner, "_release_save"):
+            state = self._inner._release_save()
+        else:
+            self._inner.release()
+            state = None
+        if held_since:
+            _recorder(self.kind, self.site, 0, False, perf_counter_ns() - held_since)
+        return state, depth
+
+    def _acquire_restore(self, saved) -> None:
+        state, depth = saved
+        timed = _active()
+        t0 = perf_counter_ns()
+        if hasattr(self._inner, "_acquire_restore"):
+            self._inner._acquire_restore(state)
+        else:
+            self._inner.acquire()
+        now = perf_counter_ns()
+        if timed:
+            _recorder(self.kind, self.site, now - t0, False, -1)
+        self._depth = depth
+        self._acquired_at = now if timed else 0
+
+    def _at_fork_reinit(self) -> None:
+        self._inner._at_fork_reinit()
+        self._depth = 0
+
+    def __repr__(self) -> str:
+        return f"<TrackedLock {self.kind} from {self.site} wrapping {self._inner!r}>"
+
+
+def _lock():
+    site = _caller_site(1)
+    return TrackedLock(_native_lock(), site, "Lock") if site else _native_lock()
+
+
+def _rlock(*args, **kwargs):
+    site = _caller_site(1)
+    inner = _native_rlock(*args, **kwargs)
+    return TrackedLock(inner, site, "RLock") if site else inner
+
+
+class _Condition(_native_condition):
+    # A subclass rather than a factory so isinstance() and subclassing keep working
+    def __init__(self, lock=None) -> None:
+        if lock is None:
+            site = _caller_site(1)
+            if site:
+                lock = TrackedLock(_native_rlock(), site, "Condition")
+        super().__init__(lock)
+
+
+def _queue_init(self, maxsize: int = 0) -> None:
+    _native_queue_init(self, maxsize)
+    self._cerbex_site = _caller_site(1)
+
+
+def _queue_get(self, block: bool = True, timeout=None):
+    # Queues created before install() have no site attribute
+    site = getattr(self, "_cerbex_site", "<unknown>")
+    if site is None or not block or not _active():
+        return _native_queue_get(self, block, timeout)
+    t0 = perf_counter_ns()
+    try:
+        return _native_queue_get(self, block, timeout)
+    finally:
+        wait = perf_counter_ns() - t0
+        # Anything over 50µs means get() blocked on an empty queue
+        _recorder("Queue", site, wait, wait > 50_000, -1)
+
+
+def install(recorder: Recorder, active: Callable[[], bool]) -> None:
+    """
+    Start handing out tracked locks/queues, reporting acquires made while
+    `active()` to `recorder`. Locks created before install() stay native.
+    """
+    global _recorder, _active
+    _recorder = recorder
+    _active = active
+    threading.Lock = _lock
+    threading.RLock = _rlock
+    threading.Condition = _Condition
+    queue.Queue.__init__ = _queue_init
+    queue.Queue.get = _queue_get
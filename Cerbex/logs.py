@@ -0,0 +1,249 @@
+# File: logs.py
+"""
+Columnar binary perf logs (PerfAnalyzer mode "columnar") and their loader.
+
+File layout (all columns little-endian and 8-byte aligned, so each can be
+memory-mapped as-is):
+    magic   b"CBXCOL1\\0"
+    u64     length of the JSON header that follows
+    header  {"rows", "names", "threads", "base_ns", "epoch_offset_ns",
+             "columns": [{"name", "dtype", "offset"}, ...]}
+    padding up to a multiple of 8; column offsets count from here
+    columns start     deltas between consecutive call starts (first is 0);
+                      rows are sorted by start time
+            duration  ns
+            func      index into names
+            thread    index into threads (thread idents)
+
+Each column uses the narrowest integer type that fits its values, so typical
+logs take 8-12 bytes per call. Writing sorts the rows with numpy.argsort when
+NumPy is installed, with no per-row Python objects. Without NumPy it falls
+back to k-way merging per-chunk sorted runs with the standard library: the
+output columns are flat arrays, but every row passes through Python as a
+short-lived int and tuple, so it is much slower (several microseconds per
+row). load() needs NumPy, imported lazily.
+"""
+import heapq
+import json
+import struct
+import sys
+import time
+from array import array
+from typing import Iterator, List, NamedTuple, Tuple
+
+from Cerbex.samples import SampleBuffer
+
+MAGIC = b"CBXCOL1\0"
+
+# numpy dtype -> array typecode
+_CODES = {"<u1": "B", "<u2": "H", "<u4": "I", "<u8": "Q"}
+
+
+def _unsigned(hi: int) -> str:
+    for dtype, bits in (("<u1", 8), ("<u2", 16), ("<u4", 32)):
+        if hi < (1 << bits):
+            return dtype
+    return "<u8"
+
+
+def _column(dtype: str, values) -> bytes:
+    if not isinstance(values, array):
+        return values.astype(dtype).tobytes()  # NumPy array
+    col = array(_CODES[dtype], values)
+    if sys.byteorder == "big":
+        col.byteswap()
+    return col.tobytes()
+
+
+def _hi(values) -> int:
+    if not len(values):
+        return 0
+    return max(values) if isinstance(values, array) else int(values.max())
+
+
+def _sorted_numpy(np, buffers: List[SampleBuffer]) -> Tuple:
+    """
+    (base, start deltas, durations, funcs, threads) as NumPy arrays, sorted
+    by start with a stable argsort.
+    """
+    starts, ends, funcs, threads = [], [], [], []
+    for t, buf in enumerate(buffers):
+        for s, e, ids, n in buf.blocks():
+            if n:
+                starts.append(np.frombuffer(s, dtype=np.int64, count=n))
+                ends.append(np.frombuffer(e, dtype=np.int64, count=n))
+                funcs.append(np.frombuffer(ids, dtype=np.uint32, count=n))
+                threads.append(np.full(n, t, dtype=np.uint32))
+    if not starts:
+        empty = np.zeros(0, dtype=np.int64)
+        return 0, empty, empty, empty, empty
+    start = np.concatenate(starts)
+    del starts
+    order = np.argsort(start, kind="stable")
+    start = start[order]
+    durations = np.concatenate(ends)[order] - start
+    funcs = np.concatenate(funcs)[order]
+    threads = np.concatenate(threads)[order]
+    base = int(start[0])
+    return base, np.diff(start, prepend=start[0]), durations, funcs, threads
+
+
+def _run(starts: array, ends: array, ids: array, order: array, thread: int):
+    for i in order:
+        yield starts[i], ends[i], ids[i], thread
+
+
+def _sorted_merge(buffers: List[SampleBuffer]) -> Tuple:
+    """
+    (base, start deltas, durations, funcs, threads) as arrays. Each chunk is
+    sorted on its own into an index array, then all chunks are k-way merged by
+    start. Memory stays bounded (a chunk's worth of Python ints while sorting
+    it, one tuple per run while merging), but every row is handled in Python.
+    """
+    runs = []
+    for t, buf in enumerate(buffers):
+        for s, e, ids, n in buf.blocks():
+            if n:
+                order = array("I", sorted(range(n), key=s.__getitem__))
+                runs.append(_run(s, e, ids, order, t))
+    deltas, durations = array("q"), array("q")
+    funcs, threads = array("I"), array("I")
+    base = prev = None
+    for start, end, fid, t in heapq.merge(*runs):
+        if prev is None:
+            base = prev = start
+        deltas.append(start - prev)
+        durations.append(end - start)
+        funcs.append(fid)
+        threads.append(t)
+        prev = start
+    return base or 0, deltas, durations, funcs, threads
+
+
+def _align(n: int) -> int:
+    return (n + 7) // 8 * 8
+
+
+def _data_start(header_len: int) -> int:
+    return _align(len(MAGIC) + 8 + header_len)
+
+
+def write_columnar(path: str, names: List[str], buffers: List[SampleBuffer]) -> int:
+    """
+    Writes all samples in `buffers` as a columnar log sorted by call start;
+    returns the row count. `names` may still be growing (calls made while
+    writing); it is copied only after the rows are collected.
+    """
+    buffers = list(buffers)
+    idents = [buf.thread for buf in buffers]
+    try:
+        import numpy
+    except ImportError:
+        base, deltas, durations, funcs, threads = _sorted_merge(buffers)
+    else:
+        base, deltas, durations, funcs, threads = _sorted_numpy(numpy, buffers)
+    names = list(names)
+    rows = len(deltas)
+    columns = [
+        ("start", _unsigned(_hi(deltas)), deltas),
+        ("duration", _unsigned(_hi(durations)), durations),
+        ("func", _unsigned(max(len(names) - 1, 0)), funcs),
+        ("thread", _unsigned(max(len(idents) - 1, 0)), threads),
+    ]
+    blobs = [_column(dtype, values) for _, dtype, values in columns]
+    header = {
+        "rows": rows,
+        "names": names,
+        "threads": idents,
+        "base_ns": base,
+        # perf_counter_ns() + epoch_offset_ns ~ time.time_ns()
+        "epoch_offset_ns": time.time_ns() - time.perf_counter_ns(),
+        "columns": [],
+    }
+    offset = 0
+    for (name, dtype, _), blob in zip(columns, blobs):
+        header["columns"].append({"name": name, "dtype": dtype, "offset": offset})
+        offset += _align(len(blob))
+    raw = json.dumps(header).encode("utf-8")
+    with open(path, "wb") as f:
+        f.write(MAGIC)
+        f.write(struct.pack("<Q", len(raw)))
+        f.write(raw)
+        f.write(b"\0" * (_data_start(len(raw)) - len(MAGIC) - 8 - len(raw)))
+        for blob in blobs:
+            f.write(blob)
+            f.write(b"\0" * (-len(blob) % 8))
+    return rows
+
+
+def read_header(path: str) -> dict:
+    """
+    Returns the JSON header, with column offsets made absolute.
+    """
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a Cerbex columnar perf log")
+        (length,) = struct.unpack("<Q", f.read(8))
+        header = json.loads(f.read(length))
+    for col in header["columns"]:
+        col["offset"] += _data_start(length)
+    return header
+
+
+class PerfLog(NamedTuple):
+    names: List[str]
+    threads: List[int]
+    start_ns: "numpy.ndarray"     # int64 epoch nanoseconds, ascending
+    duration_ns: "numpy.ndarray"  # memory-mapped
+    func: "numpy.ndarray"         # memory-mapped index into names
+    thread: "numpy.ndarray"       # memory-mapped index into threads
+
+
+def require_numpy(what: str = "Cerbex.logs.load()"):
+    try:
+        import numpy
+    except ImportError:
+        raise ImportError(f"{what} needs NumPy (pip install numpy)") from None
+    return numpy
+
+
+def _map_columns(np, path: str, header: dict) -> dict:
+    rows = header["rows"]
+    cols = {}
+    for col in header["columns"]:
+        if rows:
+            cols[col["name"]] = np.memmap(path, dtype=col["dtype"], mode="r", offset=col["offset"], shape=(rows,))
+        else:
+            cols[col["name"]] = np.zeros(0, dtype=col["dtype"])
+    return cols
+
+
+def load(path: str) -> PerfLog:
+    """
+    Memory-maps a columnar perf log into NumPy arrays. Only the start column is
+    materialized (a cumulative sum of its deltas); the others stay on disk
+    until touched, so logs larger than memory can be reduced column by column.
+    """
+    np = require_numpy()
+    header = read_header(path)
+    cols = _map_columns(np, path, header)
+    start = np.cumsum(cols["start"], dtype=np.int64)
+    start += header["base_ns"] + header["epoch_offset_ns"]
+    return PerfLog(header["names"], header["threads"], start, cols["duration"], cols["func"], cols["thread"])
+
+
+def iter_chunks(path: str, rows: int = 1 << 22) -> Iterator[PerfLog]:
+    """
+    Like load(), but yields consecutive slices of at most `rows` rows, so only
+    one chunk of start times is ever in memory.
+    """
+    np = require_numpy("Cerbex.logs.iter_chunks()")
+    header = read_header(path)
+    cols = _map_columns(np, path, header)
+    offset = header["base_ns"] + header["epoch_offset_ns"]
+    for i in range(0, header["rows"], rows):
+        start = np.cumsum(cols["start"][i:i + rows], dtype=np.int64)
+        start += offset
+        offset = int(start[-1])
+        yield PerfLog(header["names"], header["threads"], start, cols["duration"][i:i + rows],
+                      cols["func"][i:i + rows], cols["thread"][i:i + rows])
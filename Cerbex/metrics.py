@@ -0,0 +1,124 @@
+# File: metrics.py
+"""
+Live metrics in Prometheus text exposition format (version 0.0.4).
+
+MetricsServer serves GET /metrics from a ThreadingHTTPServer on a daemon
+thread, bound to localhost by default. Each scrape calls a render function;
+PerfAnalyzer's renders from its merged per-thread histograms, which only takes
+the registry lock long enough to copy a list, so instrumented threads never
+wait on a scrape.
+"""
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Optional, Sequence
+
+from Cerbex.histogram import LogHistogram
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Histogram bucket upper bounds in seconds
+DEFAULT_BOUNDS = (1e-6, 1e-5, 1e-4, 5e-4, 1e-3, 5e-3, 1e-2, 5e-2, 0.1, 0.5, 1.0, 5.0, 10.0)
+
+
+def _label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def prometheus_text(histograms: Dict[str, LogHistogram], governor=None,
+                    overhead: Optional[float] = None,
+                    bounds: Sequence[float] = DEFAULT_BOUNDS) -> str:
+    """
+    Renders per-function call counts and duration histograms, Cerbex's
+    measured overhead (a fraction of wall time, from the governor when
+    `overhead` is not given), and the governor's budget and adjustment
+    interval when one is running. Bucket counts are exact up to the
+    histogram's ~6% bucket resolution.
+    """
+    lines = [
+        "# HELP cerbex_calls_total Calls per wrapped function, including calls the governor did not sample.",
+        "# TYPE cerbex_calls_total counter",
+    ]
+    items = sorted(histograms.items())
+    for name, h in items:
+        calls = governor.counts(name)[0] if governor is not None else 0
+        lines.append(f'cerbex_calls_total{{function="{_label(name)}"}} {max(calls, h.count)}')
+    lines += [
+        "# HELP cerbex_call_duration_seconds Duration of measured calls.",
+        "# TYPE cerbex_call_duration_seconds histogram",
+    ]
+    limits = [int(b * 1e9) for b in bounds]
+    for name, h in items:
+        fn = _label(name)
+        cumulative = [0] * len(limits)
+        for _, high, c in h.buckets():
+            for i, limit in enumerate(limits):
+                if high - 1 <= limit:
+                    cumulative[i] += c
+        for b, c in zip(bounds, cumulative):
+            lines.append(f'cerbex_call_duration_seconds_bucket{{function="{fn}",le="{b:g}"}} {c}')
+        lines.append(f'cerbex_call_duration_seconds_bucket{{function="{fn}",le="+Inf"}} {h.count}')
+        lines.append(f'cerbex_call_duration_seconds_sum{{function="{fn}"}} {h.total / 1e9:.9f}')
+        lines.append(f'cerbex_call_duration_seconds_count{{function="{fn}"}} {h.count}')
+    if overhead is None and governor is not None:
+        overhead = governor.overhead()
+    if overhead is not None:
+        lines += [
+            "# HELP cerbex_overhead_ratio Fraction of wall time spent in analysis callbacks.",
+            "# TYPE cerbex_overhead_ratio gauge",
+            f"cerbex_overhead_ratio {overhead:.6f}",
+        ]
+    if governor is not None:
+        lines += [
+            "# HELP cerbex_overhead_budget_ratio Overhead budget the governor samples calls to stay under.",
+            "# TYPE cerbex_overhead_budget_ratio gauge",
+            f"cerbex_overhead_budget_ratio {governor.budget:.6f}",
+            "# HELP cerbex_overhead_interval_seconds How often the governor re-balances sampling rates.",
+            "# TYPE cerbex_overhead_interval_seconds gauge",
+            f"cerbex_overhead_interval_seconds {governor.interval:g}",
+        ]
+    return "\n".join(lines) + "\n"
+
+
+class MetricsServer:
+    """
+    Localhost HTTP listener on a daemon thread; port 0 picks a free port.
+    """
+    def __init__(self, render: Callable[[], str], host: str = "127.0.0.1", port: int = 9464) -> None:
+        self.render = render
+        self._httpd = ThreadingHTTPServer((host, port), self._handler())
+        self._httpd.daemon_threads = True
+        self.host, self.port = self._httpd.server_address[:2]
+        self._thread: Optional[threading.Thread] = None
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self) -> None:
+                if self.path.split("?", 1)[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                try:
+                    body = server.render().encode("utf-8")
+                except Exception as e:
+                    self.send_error(500, explain=repr(e))
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", CONTENT_TYPE)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args) -> None:
+                pass  # keep the target's stderr clean
+
+        return Handler
+
+    def start(self) -> "MetricsServer":
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="cerbex-metrics", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
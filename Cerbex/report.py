@@ -0,0 +1,224 @@
+# File: report.py
+"""
+Per-function summaries of perf logs for the `Cerbex report` subcommand.
+
+Logs are read in chunks: columnar logs (.cbx) through memory-mapped slices,
+raw sample files (.bin) block by block, and text perf.log files in blocks of
+lines parsed with one regex pass each. Every chunk is reduced with NumPy into
+per-function count, total, max and a log-bucketed histogram (the same buckets
+as Cerbex.histogram), so memory stays O(functions) however many calls the log
+holds. Percentiles are read from the histogram, within ~6% of the exact value.
+"""
+import fnmatch
+import re
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence
+
+from Cerbex.histogram import NUM_BUCKETS, SUB_BITS, SUB_COUNT, bucket_bounds
+from Cerbex.logs import MAGIC as COLUMNAR_MAGIC, iter_chunks, require_numpy
+from Cerbex.samples import MAGIC as RAW_MAGIC, read_samples
+
+QUANTILES = {"p50": 0.5, "p95": 0.95, "p99": 0.99}
+SORT_KEYS = ("total", "count", "mean", "p50", "p95", "p99", "max", "name")
+
+_TOOK = re.compile(rb"\[Perf\] (\S+) took ([0-9.]+)s")
+# Summary lines of an aggregate-mode perf.log
+_AGGREGATE = re.compile(rb"\[Perf\] \S+ calls=\d+ total=")
+TEXT_BLOCK = 64 << 20
+
+
+def parse_time(value: str) -> float:
+    """Epoch seconds, or an ISO 8601 date/time in local time."""
+    try:
+        return float(value)
+    except ValueError:
+        return datetime.fromisoformat(value).timestamp()
+
+
+class _Summary:
+    """
+    Per-function accumulators, grown as new function names turn up.
+    """
+    def __init__(self, np, patterns: Sequence[str]) -> None:
+        self.np = np
+        self.patterns = list(patterns)
+        self.names: List[str] = []
+        self._index: Dict[str, int] = {}
+        self.count = np.zeros(0, np.int64)
+        self.total = np.zeros(0, np.float64)
+        self.max = np.zeros(0, np.int64)
+        self.hist = np.zeros((0, NUM_BUCKETS), np.int64)
+
+    def wanted(self, name: str) -> bool:
+        return not self.patterns or any(fnmatch.fnmatchcase(name, p) for p in self.patterns)
+
+    def ids(self, names: Sequence[str]):
+        """Global IDs for `names` (-1 for names filtered out)."""
+        out = []
+        for name in names:
+            if not self.wanted(name):
+                out.append(-1)
+                continue
+            i = self._index.get(name)
+            if i is None:
+                i = self._index[name] = len(self.names)
+                self.names.append(name)
+            out.append(i)
+        grow = len(self.names) - len(self.count)
+        if grow > 0:
+            np = self.np
+            self.count = np.concatenate([self.count, np.zeros(grow, np.int64)])
+            self.total = np.concatenate([self.total, np.zeros(grow, np.float64)])
+            self.max = np.concatenate([self.max, np.zeros(grow, np.int64)])
+            self.hist = np.concatenate([self.hist, np.zeros((grow, NUM_BUCKETS), np.int64)])
+        return self.np.array(out, np.int64)
+
+    def _buckets(self, ns):
+        """Vectorized Cerbex.histogram.bucket_index."""
+        np = self.np
+        bits = np.frexp(ns.astype(np.float64))[1].astype(np.int64)  # == bit_length below 2**53
+        shift = np.maximum(bits - SUB_BITS - 1, 0)
+        idx = (shift + 1) * SUB_COUNT + (ns >> shift) - SUB_COUNT
+        idx = np.where(ns < SUB_COUNT, ns, idx)
+        return np.clip(idx, 0, NUM_BUCKETS - 1)
+
+    def add(self, fids, ns) -> None:
+        """Accumulate durations `ns` (int64) for global IDs `fids` (negative: skipped)."""
+        np = self.np
+        keep = fids >= 0
+        fids, ns = fids[keep], np.maximum(ns[keep], 0)
+        if not len(fids):
+            return
+        n = len(self.names)
+        self.count += np.bincount(fids, minlength=n)
+        self.total += np.bincount(fids, weights=ns, minlength=n)
+        np.maximum.at(self.max, fids, ns)
+        self.hist += np.bincount(fids * NUM_BUCKETS + self._buckets(ns),
+                                 minlength=n * NUM_BUCKETS).reshape(n, NUM_BUCKETS)
+
+    def rows(self) -> List[dict]:
+        np = self.np
+        lows, highs = zip(*(bucket_bounds(i) for i in range(NUM_BUCKETS)))
+        mids = (np.array(lows, np.float64) + np.array(highs, np.float64) - 1) / 2
+        cum = self.hist.cumsum(axis=1)
+        quantiles = {}
+        for key, q in QUANTILES.items():
+            rank = np.maximum(np.ceil(q * self.count), 1)
+            idx = (cum >= rank[:, None]).argmax(axis=1)
+            quantiles[key] = np.minimum(mids[idx], self.max)
+        out = []
+        for i, name in enumerate(self.names):
+            c = int(self.count[i])
+            if not c:
+                continue
+            row = {"name": name, "count": c, "total": self.total[i] / 1e9,
+                   "mean": self.total[i] / c / 1e9, "max": self.max[i] / 1e9}
+            for key in QUANTILES:
+                row[key] = float(quantiles[key][i]) / 1e9
+            out.append(row)
+        return out
+
+
+def _read_columnar(summary: _Summary, path: str, since: Optional[float], until: Optional[float]) -> None:
+    np = summary.np
+    lookup = None
+    for chunk in iter_chunks(path):
+        if lookup is None:
+            lookup = summary.ids(chunk.names)
+        lo, hi = 0, len(chunk.start_ns)
+        # Rows are sorted by start, so a time range is two binary searches
+        if since is not None:
+            lo = int(np.searchsorted(chunk.start_ns, int(since * 1e9), "left"))
+        if until is not None:
+            hi = int(np.searchsorted(chunk.start_ns, int(until * 1e9), "right"))
+        if lo < hi:
+            summary.add(lookup[np.asarray(chunk.func[lo:hi], np.int64)],
+                        np.asarray(chunk.duration_ns[lo:hi], np.int64))
+
+
+def _read_raw(summary: _Summary, path: str) -> None:
+    np = summary.np
+    names, blocks = read_samples(path)
+    lookup = summary.ids(names)
+    for _, starts, ends, ids in blocks:
+        ns = np.frombuffer(ends, np.int64) - np.frombuffer(starts, np.int64)
+        fids = np.frombuffer(ids, np.uint32).astype(np.int64)
+        # Calls recorded while the file itself was being written can have IDs past the name table
+        known = fids < len(lookup)
+        summary.add(lookup[fids[known]], ns[known])
+
+
+def _read_text(summary: _Summary, path: str) -> None:
+    np = summary.np
+    found = 0
+    aggregate = False
+    with open(path, "rb") as f:
+        tail = b""
+        while True:
+            block = f.read(TEXT_BLOCK)
+            if not block:
+                break
+            block = tail + block
+            cut = block.rfind(b"\n") + 1
+            block, tail = block[:cut], block[cut:]
+            found += _add_text(np, summary, block)
+            aggregate = aggregate or (not found and _AGGREGATE.search(block) is not None)
+        found += _add_text(np, summary, tail)
+        aggregate = aggregate or (not found and _AGGREGATE.search(tail) is not None)
+    if not found:
+        if aggregate:
+            raise ValueError(f"{path} is an aggregate-mode perf log, already summarized per function; "
+                             f"record with perf mode \"log\", \"samples\" or \"columnar\" to report on it")
+        raise ValueError(f"{path} has no per-call \"[Perf] ... took\" lines")
+
+
+def _add_text(np, summary: _Summary, block: bytes) -> int:
+    """Adds the per-call lines in `block`; returns how many there were."""
+    matches = _TOOK.findall(block)
+    if not matches:
+        return 0
+    names, secs = zip(*matches)
+    uniq, inverse = np.unique(np.array(names), return_inverse=True)
+    lookup = summary.ids([n.decode("utf-8") for n in uniq])
+    ns = np.rint(np.array(secs).astype(np.float64) * 1e9).astype(np.int64)
+    summary.add(lookup[inverse.reshape(-1)], ns)
+    return len(matches)
+
+
+def summarize(path: str, patterns: Sequence[str] = (), since: Optional[float] = None,
+              until: Optional[float] = None) -> List[dict]:
+    """
+    Returns one dict per function: name, count, and total/mean/p50/p95/p99/max
+    in seconds. `patterns` are globs over "module.func"; `since`/`until` are
+    epoch seconds and need a columnar log (text and raw logs carry no wall time).
+    Raises ValueError for text logs without per-call lines (e.g. aggregate mode).
+    """
+    np = require_numpy("Cerbex report")
+    summary = _Summary(np, patterns)
+    with open(path, "rb") as f:
+        magic = f.read(len(COLUMNAR_MAGIC))
+    if magic == COLUMNAR_MAGIC:
+        _read_columnar(summary, path, since, until)
+    elif since is not None or until is not None:
+        raise ValueError(f"{path}: a time range needs a columnar log (perf mode \"columnar\")")
+    elif magic == RAW_MAGIC:
+        _read_raw(summary, path)
+    else:
+        _read_text(summary, path)
+    return summary.rows()
+
+
+def sort_rows(rows: List[dict], key: str = "total", top: int = 0) -> List[dict]:
+    rows = sorted(rows, key=lambda r: r[key], reverse=key != "name")
+    return rows[:top] if top > 0 else rows
+
+
+def format_table(rows: List[dict]) -> str:
+    width = max([len("function")] + [len(r["name"]) for r in rows])
+    header = f"{'function':<{width}} {'count':>10} " + " ".join(
+        f"{k:>11}" for k in ("total_s", "mean_s", "p50_s", "p95_s", "p99_s", "max_s"))
+    lines = [header, "-" * len(header)]
+    for r in rows:
+        lines.append(f"{r['name']:<{width}} {r['count']:>10} " + " ".join(
+            f"{r[k]:>11.6f}" for k in ("total", "mean", "p50", "p95", "p99", "max")))
+    return "\n".join(lines)
@@ -0,0 +1,135 @@
+# File: samples.py
+"""
+Compact raw timing samples: per-thread, preallocated array chunks of
+perf_counter_ns() start/end pairs and interned function IDs (~20 bytes per call,
+no per-call allocations), written as binary blocks at exit.
+
+File layout (little-endian):
+    magic   b"CBXRAW1\\0"
+    u32     number of names, then per name: u16 length + UTF-8 "module.func"
+    blocks  u64 thread ident, u32 count, count*i64 starts, count*i64 ends, count*u32 ids
+"""
+import struct
+import sys
+import threading
+from array import array
+from typing import Dict, Iterator, List, Tuple
+
+MAGIC = b"CBXRAW1\0"
+CHUNK = 1 << 16
+
+
+class FunctionIds:
+    """
+    Interns (module, func) into dense integer IDs; lookups are lock-free.
+    """
+    def __init__(self) -> None:
+        self._ids: Dict[str, Dict[str, int]] = {}
+        self.names: List[str] = []
+        self._lock = threading.Lock()
+
+    def get(self, module: str, func: str) -> int:
+        funcs = self._ids.get(module)
+        if funcs is not None:
+            fid = funcs.get(func)
+            if fid is not None:
+                return fid
+        with self._lock:
+            funcs = self._ids.setdefault(module, {})
+            fid = funcs.get(func)
+            if fid is None:
+                # Publish the name before the ID so lock-free readers never see a dangling ID
+                fid = len(self.names)
+                self.names.append(f"{module}.{func}")
+                funcs[func] = fid
+            return fid
+
+
+class SampleBuffer:
+    """
+    One thread's samples, stored in fixed-size preallocated chunks.
+    """
+    __slots__ = ("thread", "chunks", "starts", "ends", "ids", "n")
+
+    def __init__(self, thread: int) -> None:
+        self.thread = thread
+        self.chunks: List[Tuple[array, array, array, int]] = []
+        self._new_chunk()
+
+    def _new_chunk(self) -> None:
+        self.starts = array("q", bytes(8 * CHUNK))
+        self.ends = array("q", bytes(8 * CHUNK))
+        self.ids = array("I", bytes(4 * CHUNK))
+        self.n = 0
+
+    def add(self, start: int, end: int, fid: int) -> None:
+        i = self.n
+        if i == CHUNK:
+            self.chunks.append((self.starts, self.ends, self.ids, i))
+            self._new_chunk()
+            i = 0
+        self.starts[i] = start
+        self.ends[i] = end
+        self.ids[i] = fid
+        self.n = i + 1
+
+    def blocks(self) -> List[Tuple[array, array, array, int]]:
+        return self.chunks + [(self.starts, self.ends, self.ids, self.n)]
+
+
+def _le(arr: array, n: int) -> bytes:
+    part = arr[:n]
+    if sys.byteorder == "big":
+        part.byteswap()
+    return part.tobytes()
+
+
+def write_samples(path: str, names: List[str], buffers: List[SampleBuffer]) -> None:
+    with open(path, "wb") as f:
+        f.write(MAGIC)
+        f.write(struct.pack("<I", len(names)))
+        for name in names:
+            raw = name.encode("utf-8")
+            f.write(struct.pack("<H", len(raw)))
+            f.write(raw)
+        for buf in buffers:
+            for starts, ends, ids, n in buf.blocks():
+                if not n:
+                    continue
+                f.write(struct.pack("<QI", buf.thread, n))
+                f.write(_le(starts, n))
+                f.write(_le(ends, n))
+                f.write(_le(ids, n))
+
+
+def read_samples(path: str) -> Tuple[List[str], Iterator[Tuple[int, array, array, array]]]:
+    """
+    Returns (names, blocks) where blocks yields (thread, starts, ends, ids) arrays.
+    """
+    f = open(path, "rb")
+    if f.read(len(MAGIC)) != MAGIC:
+        f.close()
+        raise ValueError(f"{path} is not a Cerbex raw sample file")
+    (count,) = struct.unpack("<I", f.read(4))
+    names = []
+    for _ in range(count):
+        (length,) = struct.unpack("<H", f.read(2))
+        names.append(f.read(length).decode("utf-8"))
+
+    def blocks():
+        with f:
+            while True:
+                header = f.read(12)
+                if len(header) < 12:
+                    return
+                thread, n = struct.unpack("<QI", header)
+                cols = []
+                for code, size in (("q", 8), ("q", 8), ("I", 4)):
+                    col = array(code)
+                    col.frombytes(f.read(size * n))
+                    if sys.byteorder == "big":
+                        col.byteswap()
+                    cols.append(col)
+                yield (thread, *cols)
+
+    return names, blocks()
@@ -0,0 +1,123 @@
+# File: snapshot.py
+"""
+On-demand snapshots of analysis output and learn reports while the target runs.
+
+A SnapshotTrigger owns a daemon thread that waits for a request: SIGUSR1 (the
+handler only sets an event) or the appearance of a control file, which is
+deleted once seen. The thread then writes every analysis's output so far and
+the learn reports to files stamped with the snapshot time, e.g.
+perf.20261019T140000-123.log and dependencies.20261019T140000-123.json.
+Snapshots are cumulative: each holds everything recorded since the process
+started, not just what changed since the previous one.
+
+Analyses are written by their own exit-time writer, run on a shallow copy whose
+file paths are retargeted to the stamped names, so the live analysis keeps its
+paths and state. The writers read the per-thread aggregates the same way their
+results() accessors do; instrumented threads keep running meanwhile. Hooks
+are switched off on the snapshot thread so serializing is not itself recorded.
+"""
+import copy
+import logging
+import os
+import signal
+import threading
+import time
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+
+def stamp_path(path: str, stamp: str) -> str:
+    """perf.log -> perf.<stamp>.log"""
+    base, ext = os.path.splitext(path)
+    return f"{base}.{stamp}{ext}"
+
+
+def snapshot_analysis(analysis, stamp: str) -> bool:
+    """
+    Write `analysis`'s output so far to stamped files. Returns False for
+    analyses that write no files.
+    """
+    # _write is the side-effect-free part of analyses whose _dump also tears down hooks
+    writer = "_write" if hasattr(analysis, "_write") else "_dump"
+    if getattr(analysis, "outfile", None) is None or not hasattr(analysis, writer):
+        return False
+    view = copy.copy(analysis)
+    for attr, value in list(vars(analysis).items()):
+        if isinstance(value, str) and (attr == "outfile" or attr.endswith("_file")):
+            setattr(view, attr, stamp_path(value, stamp))
+    getattr(view, writer)()
+    return True
+
+
+class SnapshotTrigger:
+    """
+    Takes a snapshot of `hook_mgr`'s analyses (and learn reports, if `reports`)
+    on SIGUSR1 (when `use_signal`) or whenever `control_file` appears (polled
+    every `poll` s).
+    """
+    def __init__(self, hook_mgr, use_signal: bool = True, control_file: Optional[str] = None,
+                 poll: float = 1.0, reports: bool = True) -> None:
+        self.hook_mgr = hook_mgr
+        self.reports = reports
+        self.control_file = control_file
+        self.poll = poll
+        self.taken = 0
+        self._requested = threading.Event()
+        self._stop = threading.Event()
+        if use_signal:
+            # Only the main thread may install signal handlers
+            signal.signal(signal.SIGUSR1, self._on_signal)
+        self._thread = threading.Thread(target=self._run, name="cerbex-snapshot", daemon=True)
+        self._thread.start()
+
+    def _on_signal(self, signum, frame) -> None:
+        self._requested.set()
+
+    def request(self) -> None:
+        """Ask the snapshot thread for a snapshot, like SIGUSR1 does."""
+        self._requested.set()
+
+    def _run(self) -> None:
+        self.hook_mgr._local.in_hook = True
+        timeout = self.poll if self.control_file else None
+        while not self._stop.is_set():
+            requested = self._requested.wait(timeout)
+            if self._stop.is_set():
+                return
+            if self.control_file and os.path.exists(self.control_file):
+                try:
+                    os.remove(self.control_file)
+                except OSError:
+                    pass
+                requested = True
+            if requested:
+                self._requested.clear()
+                self.take()
+
+    def take(self) -> str:
+        """
+        Writes a snapshot now (on the calling thread); returns its stamp.
+        """
+        now = time.time()
+        stamp = time.strftime("%Y%m%dT%H%M%S", time.localtime(now)) + f"-{int(now * 1000) % 1000:03d}"
+        for analysis in self.hook_mgr.analyses:
+            try:
+                snapshot_analysis(analysis, stamp)
+            except Exception as e:
+                logger.exception("snapshot of %s failed: %s", type(analysis).__name__, e)
+        if self.reports:
+            try:
+                self.hook_mgr.write_reports(
+                    deps_path=stamp_path("dependencies.json", stamp),
+                    events_path=stamp_path("events.json", stamp),
+                    allowlist_path=stamp_path("allowlist.json", stamp),
+                )
+            except Exception as e:
+                logger.exception("snapshot of learn reports failed: %s", e)
+        self.taken += 1
+        return stamp
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._requested.set()
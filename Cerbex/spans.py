@@ -0,0 +1,160 @@
+# File: spans.py
+"""
+Span API built on contextvars.
+
+    from Cerbex import span
+
+    with span("resize-batch"):
+        ...
+
+The current span follows the logical flow of control: asyncio tasks copy the
+context when created, and install_propagation() makes ThreadPoolExecutor.submit
+(and so loop.run_in_executor) and threading.Thread.start carry it as well.
+Finished spans are handed to every registered sink (see SpanAnalyzer).
+"""
+import inspect
+import itertools
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import ContextVar, copy_context
+from functools import wraps
+from time import perf_counter_ns
+from typing import Callable, List, Optional
+
+_current: ContextVar[Optional["Span"]] = ContextVar("cerbex_span", default=None)
+_span_ids = itertools.count(1)
+# Callables receiving each finished Span
+_sinks: List[Callable[["Span"], None]] = []
+
+
+class Span:
+    __slots__ = ("name", "trace_id", "span_id", "parent", "start_ns", "end_ns", "thread")
+
+    def __init__(self, name: str, parent: Optional["Span"]) -> None:
+        self.name = name
+        self.parent = parent
+        self.trace_id = parent.trace_id if parent is not None else random.getrandbits(64)
+        self.span_id = next(_span_ids)
+        self.start_ns = perf_counter_ns()
+        self.end_ns = 0
+        self.thread = threading.get_ident()
+
+    @property
+    def parent_id(self) -> int:
+        return self.parent.span_id if self.parent is not None else 0
+
+    def finish(self) -> None:
+        self.end_ns = perf_counter_ns()
+        for sink in _sinks:
+            sink(self)
+
+
+def current_span() -> Optional[Span]:
+    return _current.get()
+
+
+def start_span(name: str) -> Span:
+    """Open a child of the current span and make it current."""
+    s = Span(name, _current.get())
+    _current.set(s)
+    return s
+
+
+def end_span(name: str) -> Optional[Span]:
+    """
+    Close the innermost open span called `name` and restore its parent.
+    Spans left open above it (e.g. by an exception) are closed too.
+    """
+    s = _current.get()
+    probe = s
+    while probe is not None and probe.name != name:
+        probe = probe.parent
+    if probe is None:
+        return None
+    while s is not probe:
+        s.finish()
+        s = s.parent
+    probe.finish()
+    _current.set(probe.parent)
+    return probe
+
+
+class span:
+    """
+    Context manager (sync or async) and decorator opening a named span.
+    """
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self._token = None
+        self.span: Optional[Span] = None
+
+    def __enter__(self) -> Span:
+        install_propagation()
+        self.span = Span(self.name, _current.get())
+        self._token = _current.set(self.span)
+        return self.span
+
+    def __exit__(self, *exc) -> None:
+        self.span.finish()
+        _current.reset(self._token)
+
+    async def __aenter__(self) -> Span:
+        return self.__enter__()
+
+    async def __aexit__(self, *exc) -> None:
+        self.__exit__(*exc)
+
+    def __call__(self, fn: Callable) -> Callable:
+        name = self.name
+
+        if inspect.iscoroutinefunction(fn):
+            @wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                async with span(name):
+                    return await fn(*args, **kwargs)
+            return async_wrapper
+
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+
+
+# -------------------------------
+# Context propagation
+# -------------------------------
+_installed = False
+_install_lock = threading.Lock()
+
+
+def install_propagation() -> None:
+    """
+    Patch ThreadPoolExecutor.submit and Thread.start to run their work in a copy
+    of the submitting context. asyncio.create_task already does this natively.
+    """
+    global _installed
+    if _installed:
+        return
+    with _install_lock:
+        if _installed:
+            return
+        _installed = True
+
+        orig_submit = ThreadPoolExecutor.submit
+
+        @wraps(orig_submit)
+        def submit(self, fn, *args, **kwargs):
+            return orig_submit(self, copy_context().run, fn, *args, **kwargs)
+        ThreadPoolExecutor.submit = submit
+
+        orig_start = threading.Thread.start
+
+        @wraps(orig_start)
+        def start(self):
+            ctx = copy_context()
+            run = self.run
+            self.run = lambda: ctx.run(run)
+            return orig_start(self)
+        threading.Thread.start = start
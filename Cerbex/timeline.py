@@ -0,0 +1,80 @@
+# File: timeline.py
+"""
+Compact per-thread ring of begin/end events and Chrome Trace Event export.
+
+Each event is a perf_counter_ns() timestamp plus (function ID << 1 | phase)
+in two preallocated arrays (12 bytes per event). When a ring is full, the
+oldest events are overwritten.
+"""
+from array import array
+from typing import Any, Callable, Dict, Iterator, List, Tuple
+
+BEGIN = 0
+END = 1
+
+
+class EventRing:
+    __slots__ = ("thread", "name", "ts", "codes", "capacity", "pos", "wrapped")
+
+    def __init__(self, thread: int, name: str, capacity: int) -> None:
+        self.thread = thread
+        self.name = name
+        self.capacity = capacity
+        self.ts = array("q", bytes(8 * capacity))
+        self.codes = array("I", bytes(4 * capacity))
+        self.pos = 0
+        self.wrapped = False
+
+    def add(self, ts: int, fid: int, phase: int) -> None:
+        i = self.pos
+        self.ts[i] = ts
+        self.codes[i] = fid << 1 | phase
+        i += 1
+        if i == self.capacity:
+            i = 0
+            self.wrapped = True
+        self.pos = i
+
+    def events(self) -> Iterator[Tuple[int, int, int]]:
+        """Yields (ts, fid, phase) oldest first."""
+        order = (range(self.pos, self.capacity), range(self.pos)) if self.wrapped else (range(self.pos),)
+        ts, codes = self.ts, self.codes
+        for rng in order:
+            for i in rng:
+                code = codes[i]
+                yield ts[i], code >> 1, code & 1
+
+
+def chrome_trace(
+    rings: List[EventRing],
+    names: List[str],
+    origin_ns: int,
+    category: Callable[[str], str],
+    pid: int,
+) -> Dict[str, Any]:
+    """
+    Build a Chrome Trace Event document (also opened by Perfetto UI) with one
+    track per thread. Ends whose begin was overwritten are dropped.
+    """
+    events: List[Dict[str, Any]] = []
+    for ring in rings:
+        events.append({"name": "thread_name", "ph": "M", "pid": pid, "tid": ring.thread,
+                       "args": {"name": ring.name}})
+        depth = 0
+        for ts, fid, phase in ring.events():
+            if phase == END:
+                if not depth:
+                    continue
+                depth -= 1
+            else:
+                depth += 1
+            name = names[fid]
+            events.append({
+                "name": name,
+                "cat": category(name),
+                "ph": "B" if phase == BEGIN else "E",
+                "ts": (ts - origin_ns) / 1000,
+                "pid": pid,
+                "tid": ring.thread,
+            })
+    return {"traceEvents": events, "displayTimeUnit": "ns"}
@@ -6,9 +6,58 @@ import inspect
 import traceback
 from pathlib import Path
 from functools import wraps
-from typing import Any, Callable
+from typing import Any, Callable, Optional
+from time import perf_counter_ns
 from types import TracebackType
+from weakref import WeakKeyDictionary
 from Cerbex.hook_manager import HookManager
+from Cerbex.aio import step_timed
+
+# wrapper → [(owner, attr, original value, installed descriptor)] for every place it was installed
+_sites: "WeakKeyDictionary[Callable, list]" = WeakKeyDictionary()
+
+
+def register_site(wrapper: Callable, owner: Any, attr: str, original: Any, installed: Any = None) -> None:
+    """
+    Remember that the wrapper (or `installed`, a descriptor producing it) replaced
+    `original` as owner.attr, so the wrapper can later be swapped back out.
+    """
+    _sites.setdefault(wrapper, []).append((owner, attr, original, installed))
+
+
+def unwrap(wrapper: Callable) -> None:
+    """
+    Restore the original function everywhere this wrapper was installed.
+    References captured earlier (e.g. `from mod import fn`) keep the wrapper.
+    """
+    for owner, attr, original, installed in _sites.pop(wrapper, ()):
+        try:
+            if vars(owner).get(attr) is (wrapper if installed is None else installed):
+                setattr(owner, attr, original)
+        except Exception:
+            pass
+
+
+def wrapper_codes() -> set:
+    """
+    Code objects shared by every wrapper make_wrapper() builds, so stack walkers
+    can recognise wrapper frames (their `fn` and `module` locals name the target).
+    """
+    return {c for c in make_wrapper.__code__.co_consts
+            if isinstance(c, types.CodeType) and c.co_name in ('sync_wrapper', 'async_wrapper')}
+
+
+def wrapped_function(frame, codes: set) -> Optional[Callable]:
+    """
+    The function being called by the innermost wrapper frame at or above
+    `frame`, where `codes` is wrapper_codes(); None outside wrapped calls.
+    """
+    while frame is not None:
+        if frame.f_code in codes:
+            return frame.f_locals.get('fn')
+        frame = frame.f_back
+    return None
+
 
 def make_wrapper(
     fn: Callable,
@@ -19,14 +68,86 @@ def make_wrapper(
     _local     = hook_mgr._local
     _on_call   = hook_mgr.on_call
     _on_return = hook_mgr.on_return
+    _on_raise  = hook_mgr.on_raise
+    # Step coroutines one yield at a time so analyses see suspend/resume
+    stepped = is_async and hook_mgr.track_suspensions
+    learn = hook_mgr.mode == 'learn'
+    # Learn-mode convergence: after this many recorded returns, swap back to fn
+    converge_after = hook_mgr.converge_after if learn else 0
+    returns = 0
+    # Hot-and-cheap detection: every hot_window calls, check rate and mean duration
+    hot_window = hook_mgr.hot_window if learn and hook_mgr.hot_rate > 0 else 0
+    hot_calls = 0
+    hot_total_ns = 0
+    window_calls = 0
+    window_ns = 0
+    # Time from one call's exit to the next call's entry (the caller's own work),
+    # to estimate how often fn would run without the wrapper
+    last_exit = 0
+    window_gaps = 0
+    window_gap_ns = 0
+    window_start = perf_counter_ns()
+    retired = False
 
     def ensure_hook_flag():
         if not hasattr(_local, 'in_hook'):
             _local.in_hook = False
 
+    def count_return(wrapper):
+        nonlocal returns, retired
+        returns += 1
+        if returns >= converge_after and not retired:
+            retired = True
+            unwrap(wrapper)
+
+    def report_raise(exc):
+        ensure_hook_flag()
+        if not _local.in_hook:
+            _local.in_hook = True
+            try:
+                _on_raise(module, fn.__name__, exc)
+            finally:
+                _local.in_hook = False
+
+    def count_hot(wrapper, entered, elapsed_ns, exited):
+        nonlocal hot_calls, hot_total_ns, window_calls, window_ns, window_start, retired
+        nonlocal last_exit, window_gaps, window_gap_ns
+        hot_calls += 1
+        hot_total_ns += elapsed_ns
+        window_calls += 1
+        window_ns += elapsed_ns
+        if last_exit and entered > last_exit:
+            window_gaps += 1
+            window_gap_ns += entered - last_exit
+        last_exit = exited
+        if window_calls < hot_window:
+            return
+        now = perf_counter_ns()
+        span_ns = max(now - window_start, 1)
+        rate = window_calls * 1e9 / span_ns
+        mean_ns = window_ns / window_calls
+        # Unwrapped, a call would take fn's own time plus the caller's work before the next one
+        native_ns = max(mean_ns + (window_gap_ns / window_gaps if window_gaps else 0), 1)
+        window_calls = window_ns = window_gaps = window_gap_ns = 0
+        window_start = now
+        if rate >= hook_mgr.hot_rate and mean_ns <= hook_mgr.hot_mean_ns and not retired:
+            retired = True
+            unwrap(wrapper)
+            hook_mgr.on_unwrap(module, fn.__name__, {
+                'calls': hot_calls,
+                'total_ns': hot_total_ns,
+                'rate': rate,
+                'mean_ns': mean_ns,
+                'unwrapped_rate': max(1e9 / native_ns, rate),
+                'window_ns': span_ns,
+                'unwrapped_at': now,
+            })
+
     if is_async:
         @wraps(fn)
         async def async_wrapper(*args, **kwargs):
+            if retired:
+                return await fn(*args, **kwargs)
             ensure_hook_flag()
             if not _local.in_hook:
                 _local.in_hook = True
@@ -36,7 +157,15 @@ def make_wrapper(
                     _local.in_hook = False
 
             # print(f"[DEBUG] entering (async) {module}.{fn.__name__}")
-            result = await fn(*args, **kwargs)
+            try:
+                if stepped:
+                    result = await step_timed(fn(*args, **kwargs), module, fn.__name__,
+                                              hook_mgr.on_suspend, hook_mgr.on_resume)
+                else:
+                    result = await fn(*args, **kwargs)
+            except BaseException as e:
+                report_raise(e)
+                raise
             # print(f"[DEBUG] exiting  (async) {module}.{fn.__name__} → {type(result).__name__}")
 
             ensure_hook_flag()
@@ -46,6 +175,8 @@ def make_wrapper(
                     _on_return(module, fn.__name__, result)
                 finally:
                     _local.in_hook = False
+                if converge_after:
+                    count_return(async_wrapper)
 
             return result
 
@@ -56,25 +187,46 @@ def make_wrapper(
     else:
         @wraps(fn)
         def sync_wrapper(*args, **kwargs):
+            if retired:
+                return fn(*args, **kwargs)
             ensure_hook_flag()
+            # Hot-check timestamps are taken while in_hook is set, so the C
+            # profile hook does not record (and slow down) the timer calls
+            t0 = 0
             if not _local.in_hook:
                 _local.in_hook = True
                 try:
+                    if hot_window:
+                        entered = perf_counter_ns()
                     _on_call(module, fn.__name__, args, kwargs)
                 finally:
+                    if hot_window:
+                        t0 = perf_counter_ns()
                     _local.in_hook = False
 
             # print(f"[DEBUG] entering {module}.{fn.__name__}")
-            result = fn(*args, **kwargs)
+            try:
+                result = fn(*args, **kwargs)
+            except BaseException as e:
+                report_raise(e)
+                raise
             # print(f"[DEBUG] exiting {module}.{fn.__name__} → {type(result).__name__}")
 
             ensure_hook_flag()
             if not _local.in_hook:
                 _local.in_hook = True
                 try:
+                    if t0:
+                        elapsed_ns = perf_counter_ns() - t0
                     _on_return(module, fn.__name__, result)
                 finally:
+                    if t0:
+                        exited = perf_counter_ns()
                     _local.in_hook = False
+                if converge_after:
+                    count_return(sync_wrapper)
+                if t0:
+                    count_hot(sync_wrapper, entered, elapsed_ns, exited)
 
             return result
 
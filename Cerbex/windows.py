@@ -0,0 +1,125 @@
+# File: windows.py
+"""
+Time-windowed per-function latency for long-running processes.
+
+WindowRing keeps a ring of `slots` windows of `width` seconds of wall-clock
+(epoch) time, per thread, merged on read. Each window holds, per function,
+call count, total nanoseconds and a sparse power-of-two histogram
+{ns.bit_length(): calls}, so quantiles are within a factor of 2 and a window
+costs a few hundred bytes per active function. Windows older than the ring
+are overwritten in place; memory is bounded by slots x active functions.
+"""
+import json
+import threading
+import time
+from typing import Dict, List, NamedTuple, Optional
+
+
+class Window(NamedTuple):
+    start: float        # epoch seconds
+    count: int
+    total_ns: int
+    hist: Dict[int, int]  # ns.bit_length() -> calls
+
+    @property
+    def mean_ns(self) -> float:
+        return self.total_ns / self.count if self.count else 0.0
+
+    def percentile(self, q: float) -> float:
+        """Upper bound (2**bit - 1 ns) of the bucket holding quantile q."""
+        if not self.count:
+            return 0.0
+        rank = max(1, int(q * self.count + 0.999999))
+        seen = 0
+        for bit in sorted(self.hist):
+            seen += self.hist[bit]
+            if seen >= rank:
+                return float((1 << bit) - 1)
+        return float((1 << max(self.hist)) - 1)
+
+
+class WindowRing:
+    def __init__(self, width: float = 1.0, slots: int = 3600) -> None:
+        if width <= 0 or slots <= 0:
+            raise ValueError("window width and slot count must be positive")
+        self.width = width
+        self.slots = slots
+        self._width_ns = int(width * 1e9)
+        self._local = threading.local()
+        self._rings: List[list] = []
+        self._lock = threading.Lock()
+
+    def record(self, name: str, duration_ns: int) -> None:
+        ring = getattr(self._local, "ring", None)
+        if ring is None:
+            ring = self._local.ring = [None] * self.slots
+            with self._lock:
+                self._rings.append(ring)
+        idx = time.time_ns() // self._width_ns
+        pos = idx % self.slots
+        slot = ring[pos]
+        if slot is None or slot[0] != idx:
+            # Replace rather than clear, so a concurrent reader keeps a consistent old window
+            slot = ring[pos] = (idx, {})
+        entry = slot[1].get(name)
+        if entry is None:
+            entry = slot[1][name] = [0, 0, {}]
+        entry[0] += 1
+        entry[1] += duration_ns
+        hist = entry[2]
+        bit = duration_ns.bit_length()
+        hist[bit] = hist.get(bit, 0) + 1
+
+    def series(self, name: Optional[str] = None, since: Optional[float] = None) -> Dict[str, List[Window]]:
+        """
+        Returns function -> its windows in time order, merged across threads.
+        `name` restricts to one function, `since` (epoch seconds) drops older windows.
+        """
+        now = time.time_ns() // self._width_ns
+        oldest = now - self.slots + 1
+        if since is not None:
+            oldest = max(oldest, int(since * 1e9) // self._width_ns)
+        with self._lock:
+            rings = list(self._rings)
+        merged: Dict[str, Dict[int, list]] = {}
+        for ring in rings:
+            for slot in list(ring):
+                if slot is None or slot[0] < oldest:
+                    continue
+                idx, funcs = slot
+                for fn, (count, total, hist) in list(funcs.items()):
+                    if name is not None and fn != name:
+                        continue
+                    entry = merged.setdefault(fn, {}).get(idx)
+                    if entry is None:
+                        merged[fn][idx] = [count, total, dict(hist)]
+                        continue
+                    entry[0] += count
+                    entry[1] += total
+                    for bit, c in list(hist.items()):
+                        entry[2][bit] = entry[2].get(bit, 0) + c
+        width = self._width_ns / 1e9
+        return {fn: [Window(idx * width, c, t, h) for idx, (c, t, h) in sorted(windows.items())]
+                for fn, windows in merged.items()}
+
+    def export(self, path: str, name: Optional[str] = None, since: Optional[float] = None) -> int:
+        """
+        Writes one JSON object per function and window to `path` (JSON lines);
+        returns the number of lines written.
+        """
+        n = 0
+        with open(path, "w") as f:
+            for fn, windows in sorted(self.series(name, since).items()):
+                for w in windows:
+                    f.write(json.dumps({
+                        "start": w.start,
+                        "function": fn,
+                        "count": w.count,
+                        "total_s": w.total_ns / 1e9,
+                        "mean_s": w.mean_ns / 1e9,
+                        "p50_s": w.percentile(0.5) / 1e9,
+                        "p99_s": w.percentile(0.99) / 1e9,
+                        "hist": {str(bit): c for bit, c in sorted(w.hist.items())},
+                    }) + "\n")
+                    n += 1
+        return n
@@ -9,11 +9,15 @@ setup(
     install_requires=[
         # Add your runtime deps here (if any)
     ],
+    extras_require={
+        # Cerbex.logs.load() and Cerbex report
+        "numpy": ["numpy"],
+    },
     entry_points={
         "console_scripts": [
             "Cerbex=Cerbex.cli:main",  # CLI entry point
         ],
     },
     include_package_data=True,
-    python_requires=">=3.7",
+    python_requires=">=3.8",
 )